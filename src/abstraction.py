@@ -0,0 +1,223 @@
+import logging
+import time
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import splu, spsolve
+
+from policy_solver import PolicySolver
+from value_iteration import ValueIteration
+
+
+class CorridorSolver(PolicySolver):
+    """Solves the maze over the nodes of its CorridorGraph only.
+
+    Every corridor is followed with one of two fixed policies, towards ends[0] or
+    towards ends[1], which move along it with the action leading to the next cell.
+    Both are evaluated exactly for all corridors with one sparse solve each: the
+    discounted reward until a node is reached and the discounted probabilities of
+    reaching either end. A macro action of a node is a primitive action there; a
+    slip into a side corridor continues back towards the node, the intended move
+    into a corridor follows it to its other end. The macro actions thus carry the
+    exact rewards and outcome distributions of the slip model. solver selects how
+    the resulting node problem is solved, "policy_iteration" with one sparse solve
+    per policy or "value_iteration" with sweeps over the nodes.
+
+    The corridor cells get the better of their two corridor values and the policy is
+    greedy in the resulting value function. Committing to a direction inside a
+    corridor is not always optimal, so by default the policy is only an approximation
+    of the optimal one. refine=True finishes with vectorized value iteration
+    warm-started from the expanded values, which gives the exact solution at about
+    the cost of solving the full maze. Only mazes made of corridors shrink, in open
+    rooms nearly every cell is a node.
+    """
+    solvers = ["policy_iteration", "value_iteration"]
+
+    def __init__(self, maze, discount_factor=0.99999, epsilon=0.1, solver="policy_iteration", refine=False):
+        if solver not in self.solvers:
+            raise ValueError(f"Unknown node solver: {solver}")
+        self.maze = maze
+        self.discount_factor = discount_factor
+        self.epsilon = epsilon
+        self.solver = solver
+        self.refine = refine
+        self.metrics = maze.metrics
+        self.performed_iterations = -1
+        self.refine_iterations = 0
+        start_time = time.perf_counter()
+
+        self.model = maze.get_model()
+        self.graph = maze.get_abstraction()
+        logging.info("Corridor abstraction: %s", self.graph.summary())
+        self.corridor_values = [self.evaluate_corridors(direction) for direction in (0, 1)]
+        if solver == "policy_iteration":
+            node_values = self.policy_iteration_nodes()
+        else:
+            node_values = self.value_iteration_nodes()
+        values = self.expand(node_values)
+        self.value_function = self.model.to_grid(values)
+        self.optimal_policy = self.model.policy_grid(self.model.q_values(values, discount_factor).argmax(axis=0))
+
+        if refine:
+            refined = ValueIteration(maze, discount_factor, epsilon, mode="vectorized",
+                                     initial_values=self.value_function)
+            self.refine_iterations = refined.get_iterations()
+            self.value_function, self.optimal_policy = refined.value_function, refined.optimal_policy
+        self.solve_time = time.perf_counter() - start_time
+        if self.metrics is not None:
+            self.metrics.count('nodes', len(self.graph.nodes))
+            self.metrics.count('states', self.model.n_states)
+            self.metrics.count('sweeps', self.performed_iterations + self.refine_iterations)
+
+    def evaluate_corridors(self, direction):
+        """Exact values of all corridor states following their corridors towards ends[direction].
+
+        Returns the discounted reward until a node is reached and the discounted
+        probabilities of reaching ends[0] and ends[1], one entry per state (zero for nodes).
+        """
+        model, graph = self.model, self.graph
+        cells = np.flatnonzero(graph.corridor >= 0)
+        corridor, position = graph.corridor[cells], graph.position[cells]
+        lengths = np.array([len(c) for c in graph.corridors], dtype=np.int64)
+        # the state or end node next to every cell in the chosen direction
+        step = 1 if direction == 1 else -1
+        target_position = position + step
+        inside = (target_position >= 0) & (target_position < lengths[corridor])
+        targets = graph.ends[corridor, direction].copy()
+        starts = np.concatenate([[0], np.cumsum(lengths)])
+        flat = np.concatenate(graph.corridors) if graph.corridors else np.zeros(0, dtype=np.int64)
+        targets[inside] = flat[starts[corridor[inside]] + target_position[inside]]
+
+        policy = np.zeros(model.n_states, dtype=np.int64)
+        for a in reversed(range(len(model.actions))):
+            leads = model.next_states[a, 0, cells] == targets
+            policy[cells[leads]] = a
+        P, R = model.policy_model(policy)
+        P = P[cells]
+
+        # absorbing chain over the corridor states, the end nodes absorb
+        index = np.full(model.n_states, -1, dtype=np.int64)
+        index[cells] = np.arange(len(cells))
+        P = P.tocoo()
+        within = graph.corridor[P.col] >= 0
+        Q = sparse.csc_matrix((P.data[within], (P.row[within], index[P.col[within]])), shape=(len(cells), len(cells)))
+        rhs = np.zeros((len(cells), 3))
+        rhs[:, 0] = R[cells]
+        # the ends of a corridor leading back to its node are told apart by the side it is left from
+        edge_position = np.where(np.arange(2)[:, None] == 0, 0, lengths[corridor] - 1)
+        for end in (0, 1):
+            into = ~within & (P.col == graph.ends[corridor[P.row], end]) & (position[P.row] == edge_position[end, P.row])
+            np.add.at(rhs[:, 1 + end], P.row[into], self.discount_factor * P.data[into])
+        if len(cells):
+            solution = splu((sparse.identity(len(cells), format='csc') - self.discount_factor * Q).tocsc()).solve(rhs)
+        else:
+            solution = rhs
+        values = np.zeros((model.n_states, 3))
+        values[cells] = solution
+        return values
+
+    def corridor_value(self, direction, states, node_values):
+        """Values of corridor states following their corridors towards ends[direction] for the given node values."""
+        graph = self.graph
+        values = self.corridor_values[direction][states]
+        ends = graph.ends[graph.corridor[states]]
+        return values[:, 0] + values[:, 1] * node_values[graph.node_index[ends[:, 0]]] \
+            + values[:, 2] * node_values[graph.node_index[ends[:, 1]]]
+
+    def get_macro_actions(self):
+        """Per action the reward vector and discounted transition matrix over the nodes."""
+        model, graph = self.model, self.graph
+        nodes = graph.nodes
+        num_nodes = len(nodes)
+        macro_actions = []
+        for a in range(len(model.actions)):
+            rewards = np.zeros(num_nodes)
+            rows, cols, data = [], [], []
+            for k in range(3):
+                p = model.outcome_probs[a, k]
+                next_states = model.next_states[a, k, nodes]
+                reward = model.outcome_rewards[a, k, nodes]
+                continues = ~model.terminal[a, k, nodes]
+                rewards += p * reward
+
+                # into a node, including bouncing back
+                into_node = continues & (graph.node_index[next_states] >= 0)
+                rows.append(np.flatnonzero(into_node))
+                cols.append(graph.node_index[next_states[into_node]])
+                data.append(np.full(np.count_nonzero(into_node), p * self.discount_factor))
+
+                # into a corridor: the intended move follows it, slips head back
+                into_corridor = np.flatnonzero(continues & (graph.node_index[next_states] < 0))
+                states = next_states[into_corridor]
+                ends = graph.ends[graph.corridor[states]]
+                towards_first = ends[:, 0] == nodes[into_corridor]
+                # a corridor from a node back to itself is left at the end it was entered from
+                towards_first &= (ends[:, 1] != nodes[into_corridor]) | (graph.position[states] == 0)
+                direction = np.where(towards_first, 1 if k == 0 else 0, 0 if k == 0 else 1)
+                values = np.where(direction[:, None] == 0, self.corridor_values[0][states],
+                                  self.corridor_values[1][states])
+                rewards[into_corridor] += p * self.discount_factor * values[:, 0]
+                for end in (0, 1):
+                    rows.append(into_corridor)
+                    cols.append(graph.node_index[ends[:, end]])
+                    data.append(p * self.discount_factor * values[:, 1 + end])
+            P = sparse.csr_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+                                  shape=(num_nodes, num_nodes))
+            macro_actions.append((rewards, P))
+        return macro_actions
+
+    def policy_iteration_nodes(self):
+        macro_actions = self.get_macro_actions()
+        nodes = np.arange(len(self.graph.nodes))
+        identity = sparse.identity(len(nodes), format='csc')
+        # start along the cheapest deterministic path, like PolicyIteration
+        policy = self.model.shortest_path_policy()[self.graph.nodes]
+
+        self.performed_iterations = 0
+
+        while True:
+            P = sum(sparse.diags((policy == a).astype(float)).dot(P_a) for a, (_, P_a) in enumerate(macro_actions))
+            R = np.choose(policy, [R_a for R_a, _ in macro_actions])
+            values = spsolve((identity - P).tocsc(), R)
+            q_values = np.stack([R_a + P_a.dot(values) for R_a, P_a in macro_actions])
+            best_actions = q_values.argmax(axis=0)
+            best_values = q_values[best_actions, nodes]
+            # keep the current action unless another one is clearly better, ties would cycle
+            improved = best_values > q_values[policy, nodes] + 1e-9 * np.maximum(1, np.abs(best_values))
+            policy = np.where(improved, best_actions, policy)
+            self.performed_iterations += 1
+
+            if not improved.any():
+                break
+        return values
+
+    def value_iteration_nodes(self):
+        macro_actions = self.get_macro_actions()
+        values = np.zeros(len(self.graph.nodes))
+
+        self.performed_iterations = 0
+
+        while True:
+            max_values = np.max([R + P.dot(values) for R, P in macro_actions], axis=0)
+            delta = np.max(np.abs(max_values - values))
+            values = max_values
+            self.performed_iterations += 1
+            if self.metrics is not None:
+                self.metrics.record('residual', float(delta))
+
+            if delta < self.epsilon:
+                break
+        return values
+
+    def expand(self, node_values):
+        """Value vector over all states, corridor states take the better of their two directions."""
+        graph = self.graph
+        values = np.zeros(self.model.n_states)
+        values[graph.nodes] = node_values
+        states = np.flatnonzero(graph.corridor >= 0)
+        values[states] = np.maximum(self.corridor_value(0, states, node_values),
+                                    self.corridor_value(1, states, node_values))
+        return values
+
+    def get_iterations(self):
+        return self.performed_iterations + self.refine_iterations
@@ -0,0 +1,88 @@
+import logging
+import time
+
+import numpy as np
+from scipy import sparse
+
+from policy_solver import PolicySolver
+
+
+class BatchValueIteration():
+    """Vectorized value iteration of many mazes at once.
+
+    The compiled models of the mazes are stacked into block-diagonal transition
+    matrices, so a single sparse product per action backs up the states of every
+    maze in the batch. Each maze stops updating once its own residual drops below
+    epsilon and is then left out of the stacked matrices. Every maze ends with the
+    same sweeps, values and policy as ValueIteration(maze, mode="vectorized").
+
+    value_functions holds the results padded to the largest maze, shape (B, H, W),
+    walls and padding are 0. optimal_policies and performed_iterations are lists in
+    the order of mazes, solvers() wraps them for the rollouts.
+    """
+    def __init__(self, mazes, discount_factor=0.99999, epsilon=0.1):
+        self.mazes = mazes
+        self.discount_factor = discount_factor
+        self.epsilon = epsilon
+        self.models = [maze.get_model() for maze in mazes]
+        self.performed_iterations = [0] * len(mazes)
+        self.backups = 0
+        start_time = time.perf_counter()
+        values = self.value_iteration()
+        self.solve_time = time.perf_counter() - start_time
+
+        height = max(model.shape[0] for model in self.models)
+        width = max(model.shape[1] for model in self.models)
+        self.value_functions = np.zeros((len(mazes), height, width))
+        self.optimal_policies = []
+        for i, (model, maze_values) in enumerate(zip(self.models, values)):
+            self.value_functions[i, model.rows, model.cols] = maze_values
+            # argmax keeps the first best action, same as ValueIteration
+            self.optimal_policies.append(model.policy_grid(model.q_values(maze_values, discount_factor).argmax(axis=0)))
+
+    def stack(self, active):
+        """Block-diagonal transition matrices and stacked rewards of the active mazes."""
+        models = [self.models[i] for i in active]
+        P = [sparse.block_diag([model.P[a] for model in models], format='csr') for a in range(len(models[0].actions))]
+        R = np.concatenate([model.R for model in models], axis=1)
+        offsets = np.cumsum([0] + [model.n_states for model in models])
+        return P, R, offsets
+
+    def value_iteration(self):
+        values = [np.zeros(model.n_states) for model in self.models]
+        active = list(range(len(self.models)))
+        sweeps = 0
+
+        while active:
+            P, R, offsets = self.stack(active)
+            stacked = np.concatenate([values[i] for i in active])
+            still_active = active
+            while still_active == active:
+                max_values = np.max([R[a] + self.discount_factor * P[a].dot(stacked) for a in range(len(P))], axis=0)
+                deltas = np.maximum.reduceat(np.abs(max_values - stacked), offsets[:-1])
+                stacked = max_values
+                sweeps += 1
+                self.backups += len(stacked)
+                still_active = [i for i, delta in zip(active, deltas) if not delta < self.epsilon]
+            for j, i in enumerate(active):
+                values[i] = stacked[offsets[j]:offsets[j + 1]]
+                if i not in still_active:
+                    self.performed_iterations[i] = sweeps
+            logging.debug("Batch sweep %d, %d of %d mazes still running", sweeps, len(still_active), len(self.models))
+            active = still_active
+        return values
+
+    def solvers(self):
+        """One solved algorithm per maze, to run rollouts with like a ValueIteration."""
+        return [SolvedPolicy(maze, self.value_functions[i, :maze.num_rows, :maze.num_cols],
+                             self.optimal_policies[i], self.performed_iterations[i])
+                for i, maze in enumerate(self.mazes)]
+
+
+class SolvedPolicy(PolicySolver):
+    """Follows an already computed optimal policy, has the interface of the other algorithms."""
+    def __init__(self, maze, value_function, optimal_policy, iterations):
+        self.maze = maze
+        self.value_function = value_function
+        self.optimal_policy = optimal_policy
+        self.performed_iterations = iterations
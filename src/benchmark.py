@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import random
+import time
+
+from maze import Maze
+from ffreplan import ffreplan
+from value_iteration import ValueIteration
+from policy_iteration import PolicyIteration
+from abstraction import CorridorSolver
+from maze_generator import generated_maze_path
+from simulator import simulate
+
+
+def timed(function, *args, **kwargs):
+    start_time = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start_time
+
+
+def bench_astar(maze_path, num_searches=200, seed=0):
+    """Times A* searches from random free fields of the maze to its goal."""
+    maze = Maze(maze_path)
+    planner = ffreplan(maze)
+    model = maze.get_model()
+    rng = random.Random(seed)
+    starts = [rng.randrange(model.n_states) for _ in range(num_searches)]
+
+    planner.expansions = 0
+    start_time = time.perf_counter()
+    for state in starts:
+        maze.cur_row, maze.cur_col = int(model.rows[state]), int(model.cols[state])
+        planner.astar()
+    seconds = time.perf_counter() - start_time
+    maze.reset()
+
+    return {
+        'maze': maze_path,
+        'searches': num_searches,
+        'expansions': planner.expansions,
+        'seconds': seconds,
+        'expansions_per_second': planner.expansions / seconds,
+    }
+
+
+def bench_maze(maze_path, vi_max_size=None, num_rollouts=100, max_steps=10 ** 5):
+    """Times loading, solving, planning and rollouts on one maze, returns a list of metric records.
+    ValueIteration is skipped on mazes larger than vi_max_size, with None it runs on all of them."""
+    records = []
+
+    def record(metric, value, unit):
+        records.append({'maze': os.path.basename(maze_path), 'metric': metric, 'value': value, 'unit': unit})
+
+    maze, seconds = timed(Maze, maze_path)
+    record('load', seconds, 's')
+    record('size', maze.num_rows * maze.num_cols, 'cells')
+    _, seconds = timed(maze.get_model)
+    record('model_build', seconds, 's')
+    record('states', maze.get_model().n_states, 'states')
+    _, seconds = timed(maze.get_model().get_cost_to_go)
+    record('cost_to_go_build', seconds, 's')
+
+    if vi_max_size is None or max(maze.num_rows, maze.num_cols) <= vi_max_size:
+        vi = ValueIteration(maze, mode="vectorized")
+        record('vi_vectorized_solve', vi.solve_time, 's')
+        record('vi_vectorized_sweeps', vi.get_iterations(), 'sweeps')
+    pi = PolicyIteration(maze)
+    record('pi_solve', pi.solve_time, 's')
+    record('pi_iterations', pi.get_iterations(), 'iterations')
+    corridor_solver = CorridorSolver(maze)
+    record('corridor_solve', corridor_solver.solve_time, 's')
+    record('corridor_nodes', len(maze.get_abstraction().nodes), 'states')
+
+    planner, seconds = timed(ffreplan, maze)
+    record('astar_plan', seconds, 's')
+    result = bench_astar(maze_path, num_searches=20)
+    record('astar_expansions_per_second', result['expansions_per_second'], '1/s')
+    table = ffreplan(maze, planner="table")
+    replans = 0
+    start_time = time.perf_counter()
+    for state in range(0, maze.get_model().n_states, max(1, maze.get_model().n_states // 1000)):
+        maze.cur_row, maze.cur_col = int(maze.get_model().rows[state]), int(maze.get_model().cols[state])
+        table.plan()
+        replans += 1
+    record('table_replans_per_second', replans / (time.perf_counter() - start_time), '1/s')
+    maze.reset()
+
+    (_, lengths), seconds = timed(simulate, maze, pi.optimal_policy, num_rollouts, max_steps=max_steps)
+    record('batched_rollout_steps_per_second', lengths.sum() / seconds, '1/s')
+    steps = 0
+    start_time = time.perf_counter()
+    for i in range(min(num_rollouts, 10)):
+        random.seed(i)
+        maze.reset()
+        pi.execute()
+        steps += maze.steps
+    record('sequential_rollout_steps_per_second', steps / (time.perf_counter() - start_time), '1/s')
+    return records
+
+
+def run_suite(sizes, out_path, label="", maze_dir="bench_mazes", delay_density=0.05, loopiness=0.1, seed=0,
+              vi_max_size=None):
+    """Benchmarks generated mazes of the given sizes and appends the records to a .jsonl file."""
+    folder = os.path.dirname(out_path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder, exist_ok=True)
+    for size in sizes:
+        maze_path = generated_maze_path(maze_dir, size, delay_density, loopiness, seed)
+        records = bench_maze(maze_path, vi_max_size)
+        with open(out_path, 'a') as file:
+            for record in records:
+                record.update({'label': label, 'size': size, 'delay_density': delay_density,
+                               'loopiness': loopiness, 'seed': seed, 'time': time.time()})
+                file.write(json.dumps(record) + '\n')
+        for record in records:
+            print(f"{size:5} {record['metric']:38} {record['value']:14.4f} {record['unit']}")
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the planners on generated mazes.")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[51, 101, 201, 501, 1001, 2001],
+                        help="ValueIteration is timed on all of them unless --vi-max-size is given")
+    parser.add_argument("--out", default="logs/benchmark.jsonl")
+    parser.add_argument("--label", default="", help="e.g. a version, stored with every record")
+    parser.add_argument("--maze-dir", default="bench_mazes")
+    parser.add_argument("--delay-density", type=float, default=0.05)
+    parser.add_argument("--loopiness", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--vi-max-size", type=int, default=None,
+                        help="larger mazes are only solved with policy iteration, e.g. 201 for a quick run")
+    parser.add_argument("--astar", action="store_true", help="only the A* micro-benchmark on the dataset")
+    args = parser.parse_args()
+
+    if args.astar:
+        for maze_path in ["dataset/maze-51-A1.txt", "dataset/maze-51-B.txt", "dataset/maze-101-B.txt"]:
+            result = bench_astar(maze_path)
+            print(f"{result['maze']:26} {result['searches']:5} searches {result['expansions']:9} expansions "
+                  f"{result['seconds']:7.3f} s {result['expansions_per_second']:12.0f} expansions/s")
+    else:
+        run_suite(args.sizes, args.out, args.label, args.maze_dir, args.delay_density, args.loopiness, args.seed,
+                  args.vi_max_size)
@@ -0,0 +1,132 @@
+import time
+
+import numpy as np
+
+from maze import Maze, FREE, WALL, START, END, DELAY
+from policy_solver import PolicySolver
+from solution_cache import WALL_CODE
+
+# rough working memory of one cell in a block backup: float64 temporaries per direction and action
+BYTES_PER_CELL = 128
+
+# reward for attempting to enter a cell of the given type, walls count as a plain step
+REWARDS = np.zeros(5)
+REWARDS[[FREE, WALL, START]] = -1
+REWARDS[END] = 200
+REWARDS[DELAY] = -50
+
+
+class PolicyGrid():
+    """Read-only optimal_policy over a uint8 array of action codes, indexed as policy[row][col].
+
+    Walls have WALL_CODE and read as '#', like in the list of lists of the other solvers.
+    """
+    def __init__(self, codes, actions):
+        self.codes = codes
+        self.names = np.array(list(actions) + ['#'] * (WALL_CODE + 1 - len(actions)), dtype=object)
+
+    def __getitem__(self, row):
+        return self.names[self.codes[row]]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def tolist(self):
+        return self.names[self.codes].tolist()
+
+
+class BlockedValueIteration(PolicySolver):
+    """Value iteration for mazes too big for the compiled maze model.
+
+    Works directly on maze.grid, a block of rows at a time: each block is backed up
+    at once from the current values of its rows and the row above and below, then
+    written back before the next block is processed. The blocks are swept top-down
+    and bottom-up in turns. block_rows follows from memory_budget (bytes of working
+    memory per block) unless given.
+
+    value_function is float32 and optimal_policy a PolicyGrid over uint8 action codes.
+    With values_path and policy_path they are .npy files opened as np.memmap, so
+    neither has to fit into memory.
+    """
+    def __init__(self, maze: Maze, discount_factor=0.99999, epsilon=0.1, memory_budget=256 * 2 ** 20,
+                 block_rows=None, values_path=None, policy_path=None):
+        self.maze = maze
+        self.discount_factor = discount_factor
+        self.epsilon = epsilon
+        self.metrics = maze.metrics
+        # outside the maze counts as wall
+        self.cells = np.pad(maze.grid, 1, constant_values=WALL)
+        shape = (maze.num_rows, maze.num_cols)
+        self.block_rows = block_rows or max(1, memory_budget // (maze.num_cols * BYTES_PER_CELL))
+        self.blocks = [(start, min(start + self.block_rows, maze.num_rows))
+                       for start in range(0, maze.num_rows, self.block_rows)]
+        self.performed_iterations = -1
+        self.backups = 0
+        start_time = time.perf_counter()
+
+        self.value_function = self.allocate(values_path, shape, np.float32)
+        self.value_function[:] = 0
+        self.value_iteration()
+        codes = self.allocate(policy_path, shape, np.uint8)
+        for start, stop in self.blocks:
+            _, codes[start:stop] = self.backup_block(start, stop)
+        self.optimal_policy = PolicyGrid(codes, maze.get_actions())
+        self.solve_time = time.perf_counter() - start_time
+
+        if self.metrics is not None:
+            self.metrics.count('backups', self.backups)
+            self.metrics.count('sweeps', self.performed_iterations)
+
+    def allocate(self, path, shape, dtype):
+        if path is None:
+            return np.empty(shape, dtype=dtype)
+        return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+
+    def backup_block(self, start, stop):
+        """New values and greedy action codes of the rows start:stop."""
+        # the block with a margin of one row and column
+        low, high = max(start - 1, 0), min(stop + 1, self.maze.num_rows)
+        cells = self.cells[low:high + 2]
+        padded_values = np.pad(self.value_function[low:high].astype(np.float64), 1)
+        rows = slice(start - low + 1, stop - low + 1)
+        cols = slice(1, self.maze.num_cols + 1)
+        own_values = padded_values[rows, cols]
+
+        outcomes = {}
+        for d_row, d_col in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
+            target = (slice(rows.start + d_row, rows.stop + d_row), slice(cols.start + d_col, cols.stop + d_col))
+            next_cells = cells[target]
+            rewards = REWARDS[next_cells]
+            # hit wall, not moving anywhere; the goal state terminates
+            next_values = np.where(next_cells == WALL, own_values, np.where(next_cells == END, 0, padded_values[target]))
+            outcomes[d_row, d_col] = rewards + self.discount_factor * next_values
+
+        q_values = np.stack([sum(p * outcomes[move] for p, move in self.maze.get_action_results(action, (0, 0)))
+                             for action in self.maze.get_actions()])
+        walls = cells[rows, cols] == WALL
+        # argmax keeps the first best action, same as the other solvers
+        best_actions = q_values.argmax(axis=0)
+        new_values = np.where(walls, 0, np.take_along_axis(q_values, best_actions[None], axis=0)[0])
+        self.backups += np.count_nonzero(~walls)
+        return new_values.astype(np.float32), np.where(walls, WALL_CODE, best_actions).astype(np.uint8)
+
+    def value_iteration(self):
+        self.performed_iterations = 0
+
+        while True:
+            delta = 0
+            blocks = self.blocks if self.performed_iterations % 2 == 0 else reversed(self.blocks)
+            for start, stop in blocks:
+                new_values, _ = self.backup_block(start, stop)
+                delta = max(delta, float(np.max(np.abs(new_values - self.value_function[start:stop]))))
+                self.value_function[start:stop] = new_values
+            self.performed_iterations += 1
+            if self.metrics is not None:
+                self.metrics.record('residual', delta)
+
+            if self.performed_iterations % 100 == 0:
+                print(f"\rPerformed iterations: {self.performed_iterations:8}, with delta {delta:.5f}", end="")
+
+            if delta < self.epsilon:
+                break
+        print()
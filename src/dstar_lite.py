@@ -0,0 +1,111 @@
+import heapq
+
+from maze import Maze
+
+INF = float('inf')
+
+
+class DStarLite():
+    """Incremental planner searching backward from the goal (D* Lite).
+
+    g/rhs values are kept between calls of plan(), so when the agent ends up somewhere
+    else than planned only the part of the search frontier affected by the new start
+    is expanded again. Edge costs are the costs of the entered field as in
+    ffreplan.astar, except the goal costs 1 instead of -200. Every path to the goal
+    enters it exactly once, so the chosen paths are the same and path_cost() maps the
+    cost back to the one astar reports.
+    """
+    def __init__(self, maze: Maze):
+        self.maze = maze
+        self.model = maze.get_model()
+        self.neighbours, self.step_costs = self.model.get_graph()
+        self.rows = self.model.rows.tolist()
+        self.cols = self.model.cols.tolist()
+        self.goal = int(self.model.goal_state)
+        self.goal_cost = -self.maze.get_reward((self.maze.end_row, self.maze.end_col))
+
+        self.expansions = 0
+        self.g = [INF] * self.model.n_states
+        self.rhs = [INF] * self.model.n_states
+        self.rhs[self.goal] = 0
+        self.km = 0
+        self.start = None
+        self.last_start = None
+        # lazy deletion, an entry is valid only if its key matches queued[state]
+        self.queue = []
+        self.queued = {}
+
+    def heuristic(self, a, b):
+        return abs(self.rows[a] - self.rows[b]) + abs(self.cols[a] - self.cols[b])
+
+    def calculate_key(self, state):
+        g_rhs = min(self.g[state], self.rhs[state])
+        return (g_rhs + self.heuristic(self.start, state) + self.km, g_rhs)
+
+    def push(self, state):
+        key = self.calculate_key(state)
+        self.queued[state] = key
+        heapq.heappush(self.queue, (key, state))
+
+    def top_key(self):
+        while self.queue:
+            key, state = self.queue[0]
+            if self.queued.get(state) == key:
+                return key
+            heapq.heappop(self.queue)
+        return (INF, INF)
+
+    def update_vertex(self, state):
+        if state != self.goal:
+            cost = self.step_costs
+            g = self.g
+            self.rhs[state] = min(cost[n] + g[n] for n in self.neighbours[state])
+        self.queued.pop(state, None)
+        if self.g[state] != self.rhs[state]:
+            self.push(state)
+
+    def compute_shortest_path(self):
+        while self.top_key() < self.calculate_key(self.start) or self.rhs[self.start] != self.g[self.start]:
+            key_old, state = heapq.heappop(self.queue)
+            del self.queued[state]
+            self.expansions += 1
+            key_new = self.calculate_key(state)
+            if key_old < key_new:
+                self.push(state)
+            elif self.g[state] > self.rhs[state]:
+                self.g[state] = self.rhs[state]
+                for pred in self.neighbours[state]:
+                    self.update_vertex(pred)
+            else:
+                self.g[state] = INF
+                self.update_vertex(state)
+                for pred in self.neighbours[state]:
+                    self.update_vertex(pred)
+
+    def plan(self, pos):
+        """Returns the cheapest path from pos to the goal as a list of fields, pos excluded."""
+        start = int(self.model.state_index[pos])
+        if self.start is None:
+            self.start = self.last_start = start
+            self.push(self.goal)
+        elif start != self.start:
+            # the agent moved, keys computed for the old start stay valid up to km
+            self.km += self.heuristic(self.last_start, start)
+            self.start = self.last_start = start
+        self.compute_shortest_path()
+
+        path = []
+        state = start
+        if self.g[state] == INF:
+            return path
+        while state != self.goal:
+            state = min(self.neighbours[state], key=lambda n: self.step_costs[n] + self.g[n])
+            path.append((self.rows[state], self.cols[state]))
+        return path
+
+    def path_cost(self, pos):
+        """Cost of the planned path from pos in the units of ffreplan.astar."""
+        start = int(self.model.state_index[pos])
+        if self.g[start] == INF or start == self.goal:
+            return self.g[start]
+        return self.g[start] - self.step_costs[self.goal] + self.goal_cost
@@ -1,11 +1,45 @@
-from queue import PriorityQueue
+import heapq
+from collections import deque
 from maze import Maze
+from dstar_lite import DStarLite
 import logging
 
+INF = float('inf')
+
 class ffreplan():
-    def __init__(self, maze: Maze):
+    """Plans a deterministic path to the goal and replans whenever the agent slips off it.
+
+    planner selects how the paths are found:
+        "astar"      -- a fresh A* search from the current position on every replan
+        "dstar_lite" -- incremental D* Lite search from the goal, reusing its values
+                        across replans and rollouts
+        "table"      -- follows successor pointers of a cost-to-go table computed once
+                        per maze by a backward Dijkstra search from the goal
+    expansions counts the expanded nodes of all searches so far, replans the plans
+    made after the agent slipped off its path in all episodes so far. ffreplan plans
+    online only, get_iterations() stays 0 however many episodes were executed. With
+    maze.metrics set, the plans, replans per episode, expansions and planning time
+    are reported into it.
+
+    execute() moves the agent of the maze along the path planned by reset(), with
+    another Agent of the maze it plans a path of its own for it, so one planner can
+    drive many agents through the same maze.
+    """
+    planners = ["astar", "dstar_lite", "table"]
+
+    def __init__(self, maze: Maze, planner="astar"):
+        if planner not in self.planners:
+            raise ValueError(f"Unknown planner: {planner}")
         self.maze = maze
-        self.path = self.astar()
+        self.planner = planner
+        self.expansions = 0
+        self.replans = 0
+        self.metrics = maze.metrics
+        model = maze.get_model()
+        self.rows = model.rows.tolist()
+        self.cols = model.cols.tolist()
+        self.dstar_lite = DStarLite(maze) if planner == "dstar_lite" else None
+        self.path = self.plan()
 
     def get_iterations(self):
         return 0
@@ -14,71 +48,125 @@ class ffreplan():
         # check if the maze was reset
         if not self.maze.at_the_start():
             logging.error("Maze was not reset.")
-        self.path = self.astar()
+        self.path = self.plan()
+
+    def plan(self, position=None):
+        """Path from position to the goal as a deque of fields, from the position of the maze's agent by default."""
+        if position is None:
+            position = self.maze.get_position()
+        if self.metrics is None:
+            return self.search(position)
+        expansions = self.expansions
+        with self.metrics.phase('planning'):
+            path = self.search(position)
+        self.metrics.count('plans')
+        self.metrics.count('expansions', self.expansions - expansions)
+        return path
+
+    def search(self, position):
+        if self.planner == "dstar_lite":
+            path = self.dstar_lite.plan(position)
+            self.expansions = self.dstar_lite.expansions
+            return deque(path)
+        if self.planner == "table":
+            return self.follow_table(position)
+        return self.astar(position)
+
+    def follow_table(self, position):
+        model = self.maze.get_model()
+        _, successors = model.get_cost_to_go()
+        path = deque()
+        state = successors[model.state_index[position]]
+        while state >= 0:
+            path.append((self.rows[state], self.cols[state]))
+            state = successors[state]
+        return path
 
     def heuristic(self, row, col):
         # Calculate the Manhattan distance heuristic from (row, col) to the goal
         return abs(row - self.maze.end_row) + abs(col - self.maze.end_col)
     
-    def execute(self):
+    def execute(self, agent=None):
+        if agent is None:
+            agent = self.maze.agent
+            path = self.path
+        else:
+            path = self.plan(agent.get_position())
         reward = 0
-        
-        while self.path:
-            move_goal = self.path.pop(0)
-            direction = self.maze.next_to_direction(move_goal)
-            reward += self.maze.move(direction)
-            pos_after_move = self.maze.get_position() 
+        replans = 0
+
+        while path:
+            move_goal = path.popleft()
+            direction = agent.next_to_direction(move_goal)
+            reward += agent.move(direction)
+            pos_after_move = agent.get_position() 
 
             if pos_after_move != move_goal:
                 logging.debug("Replanning.")
-                self.path = self.astar()
+                replans += 1
+                path = self.plan(pos_after_move)
             
-            if self.maze.goal_reached():
+            if agent.goal_reached():
                 logging.debug("Goal was reached.")
                 break
 
+        if agent is self.maze.agent:
+            self.path = path
+        self.replans += replans
+        if self.metrics is not None:
+            self.metrics.count('replans', replans)
+            self.metrics.record('replans_per_episode', replans)
         return reward
 
-    def astar(self):
-        open_set = PriorityQueue()
-        open_set.put((0, self.maze.cur_row, self.maze.cur_col))
+    def astar(self, position=None):
+        """A* search from position (the current one by default) to the goal, returns the path as a deque of fields.
 
-        came_from = {}
-        g_score = {(row_i, col_i): float('inf') for row_i in range(len(self.maze.maze)) for col_i in range(len(self.maze.maze[row_i]))}
-        g_score[(self.maze.cur_row, self.maze.cur_col)] = 0
+        Runs on the flat state numbering and neighbour lists of the maze model. The goal
+        is entered with cost 1 instead of -200; every path ends there, so the same
+        paths are the cheapest and the Manhattan heuristic stays consistent.
+        """
+        model = self.maze.get_model()
+        neighbours, step_costs = model.get_graph()
+        rows, cols = self.rows, self.cols
+        end_row, end_col = self.maze.end_row, self.maze.end_col
+        goal = int(model.goal_state)
+        if position is None:
+            position = self.maze.get_position()
+        start = int(model.state_index[position])
 
-        while not open_set.empty():
-            _, current_row, current_col = open_set.get()
+        g_score = [INF] * model.n_states
+        came_from = [-1] * model.n_states
+        closed = bytearray(model.n_states)
+        g_score[start] = 0
+        # ties on f are broken towards the goal
+        h = abs(rows[start] - end_row) + abs(cols[start] - end_col)
+        open_set = [(h, h, start)]
 
-            if current_row == self.maze.end_row and current_col == self.maze.end_col:
+        while open_set:
+            _, _, current = heapq.heappop(open_set)
+            if closed[current]:
+                continue
+            closed[current] = 1
+            self.expansions += 1
+
+            if current == goal:
                 # Reconstruct the path and return it
-                path = []
-                pos = (current_row, current_col)
-                while pos in came_from:
-                    path.append(pos)
-                    pos = came_from[pos]
-                path.reverse()
+                path = deque()
+                while current != start:
+                    path.appendleft((rows[current], cols[current]))
+                    current = came_from[current]
                 return path
 
-            neighbors = [(current_row - 1, current_col), (current_row + 1, current_col),
-                         (current_row, current_col - 1), (current_row, current_col + 1)]
-
-            for neighbor_row, neighbor_col in neighbors:
-                if (
-                    neighbor_row < 0
-                    or neighbor_row >= len(self.maze.maze)
-                    or neighbor_col < 0
-                    or neighbor_col >= len(self.maze.maze[0])
-                    or self.maze.maze[neighbor_row][neighbor_col] == '#'
-                    # or self.maze.maze[neighbor_row][neighbor_col] == 'D'
-                ):
+            current_g = g_score[current]
+            for neighbour in neighbours[current]:
+                if closed[neighbour]:
                     continue
-
                 # handle guide the search from the delays with g score
-                tentative_g_score = g_score[(current_row, current_col)] - self.maze.get_reward((neighbor_row, neighbor_col)) 
+                tentative_g_score = current_g + step_costs[neighbour]
+                if tentative_g_score < g_score[neighbour]:
+                    came_from[neighbour] = current
+                    g_score[neighbour] = tentative_g_score
+                    h = abs(rows[neighbour] - end_row) + abs(cols[neighbour] - end_col)
+                    heapq.heappush(open_set, (tentative_g_score + h, h, neighbour))
 
-                if tentative_g_score < g_score[(neighbor_row, neighbor_col)]:
-                    came_from[(neighbor_row, neighbor_col)] = (current_row, current_col)
-                    g_score[(neighbor_row, neighbor_col)] = tentative_g_score
-                    f_score = tentative_g_score + self.heuristic(neighbor_row, neighbor_col)
-                    open_set.put((f_score, neighbor_row, neighbor_col))
+        return deque()
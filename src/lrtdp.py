@@ -0,0 +1,194 @@
+from maze import Maze
+from policy_solver import PolicySolver
+import heapq
+import numpy as np
+import logging
+import random
+import time
+
+
+def value_bound(distances, discount_factor):
+    """Upper bound on the value of a state at least distances moves from the goal.
+
+    Every move before the goal is rewarded -1 at best (delays and walls only lower
+    it) and entering the goal 200, so d moves are worth at most
+    -(1 + γ + ... + γ^(d-2)) + 200 γ^(d-1). The goal itself is bounded by 200.
+    """
+    distances = np.asarray(distances, dtype=float)
+    steps = np.maximum(distances - 1, 0)
+    if discount_factor == 1:
+        penalty = steps
+    else:
+        penalty = (1 - discount_factor ** steps) / (1 - discount_factor)
+    return np.where(distances > 0, -penalty + 200 * discount_factor ** steps, 200.0)
+
+
+class LRTDP(PolicySolver):
+    """Labeled real-time dynamic programming (Bonet & Geffner, 2003).
+
+    Runs greedy trials from the start state over values initialized with an upper
+    bound of the optimal values and labels a state solved once all states its greedy
+    policy can reach have a Bellman residual below epsilon. Solving stops when the
+    start state is labeled, so only states relevant from the start are backed up.
+
+    heuristic selects the upper bound:
+        "manhattan" -- value_bound of the Manhattan distance to the goal, like
+                       ffreplan.heuristic
+        "relaxed"   -- optimal values of the deterministic relaxation, where the agent
+                       picks the outcome of every move; aware of delays and walls and
+                       much tighter, at the price of one Dijkstra search over the maze
+    Trials sample the slips from a random.Random(seed) of their own, so the global
+    random state of the rollouts is untouched.
+
+    touched_states counts the states backed up at least once, compare with
+    n_states of the maze model. performed_iterations counts the trials.
+    """
+    heuristics = ["manhattan", "relaxed"]
+
+    def __init__(self, maze: Maze, discount_factor=0.99999, epsilon=0.1, heuristic="relaxed", seed=0):
+        if heuristic not in self.heuristics:
+            raise ValueError(f"Unknown heuristic: {heuristic}")
+        self.maze = maze
+        self.discount_factor = discount_factor
+        self.epsilon = epsilon
+        self.heuristic = heuristic
+        self.rng = random.Random(seed)
+        self.metrics = maze.metrics
+        self.backups = 0
+        self.performed_iterations = 0
+        start_time = time.perf_counter()
+
+        self.model = maze.get_model()
+        self.values = self.get_bound()
+        self.outcomes = self.get_outcomes()
+        self.solved = bytearray(self.model.n_states)
+        self.touched = bytearray(self.model.n_states)
+
+        start = int(self.model.start_state)
+        while not self.solved[start]:
+            self.trial(start)
+            self.performed_iterations += 1
+
+        self.touched_states = sum(self.touched)
+        values = np.array(self.values)
+        self.value_function = self.model.to_grid(values)
+        # the greedy actions of the solved states, untouched states follow their bounds
+        self.optimal_policy = self.model.policy_grid(self.model.q_values(values, discount_factor).argmax(axis=0))
+        self.solve_time = time.perf_counter() - start_time
+        logging.info("LRTDP backed up %d of %d states in %d trials.", self.touched_states, self.model.n_states,
+                     self.performed_iterations)
+        if self.metrics is not None:
+            self.metrics.count('backups', self.backups)
+            self.metrics.count('trials', self.performed_iterations)
+            self.metrics.count('touched_states', self.touched_states)
+            self.metrics.count('states', self.model.n_states)
+
+    def get_bound(self):
+        model = self.model
+        if self.heuristic == "manhattan":
+            distances = np.abs(model.rows - self.maze.end_row) + np.abs(model.cols - self.maze.end_col)
+            return value_bound(distances, self.discount_factor).tolist()
+
+        # Dijkstra from the goal in the order of decreasing values, a step only lowers
+        # the value as long as it stays above -1 / (1 - γ)
+        neighbours, step_costs = model.get_graph()
+        goal = int(model.goal_state)
+        discount_factor = self.discount_factor
+        # unreachable states keep the bound of the goal
+        values = [200.0] * model.n_states
+        done = bytearray(model.n_states)
+        done[goal] = 1
+        open_set = [(-200.0, state) for state in neighbours[goal]]
+        heapq.heapify(open_set)
+        best = {state: 200.0 for state in neighbours[goal]}
+        while open_set:
+            value, state = heapq.heappop(open_set)
+            if done[state]:
+                continue
+            done[state] = 1
+            values[state] = -value
+            # moving from pred into state is rewarded with minus its step cost
+            pred_value = -step_costs[state] - discount_factor * value
+            for pred in neighbours[state]:
+                if not done[pred] and pred_value > best.get(pred, float('-inf')):
+                    best[pred] = pred_value
+                    heapq.heappush(open_set, (-pred_value, pred))
+        return values
+
+    def get_outcomes(self):
+        """Per action the (probability, next states, rewards, terminal) lists of its three outcomes."""
+        model = self.model
+        return [[(model.outcome_probs[a, k], model.next_states[a, k].tolist(), model.outcome_rewards[a, k].tolist(),
+                  model.terminal[a, k].tolist()) for k in range(3)]
+                for a in range(len(model.actions))]
+
+    def q_value(self, state, action):
+        values = self.values
+        discount_factor = self.discount_factor
+        return sum(p * (rewards[state] + (0 if terminal[state] else discount_factor * values[next_states[state]]))
+                   for p, next_states, rewards, terminal in action)
+
+    def greedy(self, state):
+        """Index and value of the best action in state, the first one on ties."""
+        best_action, best_value = 0, float('-inf')
+        for a, action in enumerate(self.outcomes):
+            value = self.q_value(state, action)
+            if value > best_value:
+                best_action, best_value = a, value
+        return best_action, best_value
+
+    def backup(self, state):
+        """Updates the value of state, returns its greedy action and the residual."""
+        self.backups += 1
+        self.touched[state] = 1
+        action, value = self.greedy(state)
+        residual = abs(value - self.values[state])
+        self.values[state] = value
+        return action, residual
+
+    def sample(self, state, action):
+        """Next state after taking action in state, or -1 when the move ends in the goal."""
+        draw = self.rng.random()
+        for p, next_states, _, terminal in self.outcomes[action]:
+            draw -= p
+            if draw < 0:
+                break
+        return -1 if terminal[state] else next_states[state]
+
+    def trial(self, state):
+        visited = []
+        while state >= 0 and not self.solved[state]:
+            visited.append(state)
+            action, _ = self.backup(state)
+            state = self.sample(state, action)
+        while visited:
+            if not self.check_solved(visited.pop()):
+                break
+
+    def check_solved(self, state):
+        """Labels the states the greedy policy reaches from state solved if all of them are epsilon-consistent,
+        otherwise backs them up."""
+        consistent = True
+        open_states = [state] if not self.solved[state] else []
+        closed = []
+        seen = {state}
+        while open_states:
+            state = open_states.pop()
+            closed.append(state)
+            action, value = self.greedy(state)
+            if abs(value - self.values[state]) > self.epsilon:
+                consistent = False
+                continue
+            for _, next_states, _, terminal in self.outcomes[action]:
+                next_state = next_states[state]
+                if not terminal[state] and not self.solved[next_state] and next_state not in seen:
+                    seen.add(next_state)
+                    open_states.append(next_state)
+
+        if consistent:
+            for state in closed:
+                self.solved[state] = 1
+        else:
+            while closed:
+                self.backup(closed.pop())
+        return consistent
@@ -3,54 +3,404 @@ import random
 import numpy as np
 import os
 import pandas as pd
+import json
+import time
+import cProfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
 
 from maze import Maze
 from ffreplan import ffreplan
-from value_iteration import ValueIteration
+from value_iteration import ValueIteration, solve_sweep
+from lrtdp import LRTDP
+from qlearning import QLearning
+from batch_value_iteration import BatchValueIteration, SolvedPolicy
+from policy_solver import PolicySolver
+from simulator import simulate
+from policy_evaluation import evaluate_policy, stationary_policy
+from solution_cache import SolutionCache, maze_hash, encode_policy, decode_policy
+from results_log import ResultsLog
+from metrics import phase, RunningStats
+import render
 import experiments
 
 num_rollouts = 200
 
-def validate_single_maze(maze_path, alg_clas):
-    """Runs algorithm multiple times to get information about the average rewards."""
-    logging.info("Running validation for: %s", maze_path)
-    rewards = np.zeros(num_rollouts)
-    maze = Maze(maze_path)
-    algorithm = alg_clas(maze)
-    for i in range(num_rollouts):
+def describe_algorithm(alg_clas, batched=False, ci_width=None, time_budget=None, exact=False):
+    """Parameters identifying a run in the results log, alg_clas is a class or a functools.partial."""
+    params = {'num_rollouts': num_rollouts, 'batched': batched}
+    # only adaptive runs have these, the runs logged before keep their keys
+    if ci_width is not None:
+        params['ci_width'] = ci_width
+    if time_budget is not None:
+        params['time_budget'] = time_budget
+    if exact:
+        params['exact'] = True
+    if isinstance(alg_clas, partial):
+        for key, value in alg_clas.keywords.items():
+            # objects like a SolutionCache don't change the results
+            if isinstance(value, (int, float, str, bool, type(None))):
+                params[key] = value
+        alg_clas = alg_clas.func
+    params['class'] = alg_clas.__name__
+    return json.dumps(params, sort_keys=True)
+
+def run_rollouts(maze, algorithm, rollouts, verbose=False):
+    """Runs the given rollouts, rollout i is seeded with i."""
+    rewards = np.zeros(len(rollouts))
+    lengths = np.zeros(len(rollouts))
+    for j, i in enumerate(rollouts):
         random.seed(i)
         maze.reset()
         algorithm.reset()
-        rewards[i] = algorithm.execute()
-        print(f"\rRollout: {i + 1}/{num_rollouts}", end="")
+        rewards[j] = algorithm.execute()
+        lengths[j] = maze.steps
+        if verbose:
+            print(f"\rRollout: {i + 1}/{num_rollouts}", end="")
+    return rewards, lengths
+
+def run_adaptive_rollouts(maze, algorithm, ci_width=None, time_budget=None, batched=False, min_rollouts=10):
+    """Runs rollouts 0, 1, ... until the 95% confidence interval of the average reward is at most
+    ci_width wide, time_budget seconds have passed or num_rollouts rollouts were run.
+    The rollouts are seeded like in run_rollouts (or simulate with batched=True), so they are
+    the first ones of the full evaluation. At least min_rollouts rollouts are run. Batched
+    rollouts are simulated in chunks of half the rollouts so far, which may overshoot by that much."""
+    stats = RunningStats()
+    rewards, lengths = [], []
+    start_time = time.perf_counter()
+    while len(rewards) < num_rollouts:
+        first = len(rewards)
+        if batched:
+            size = min(max(min_rollouts, first // 2), num_rollouts - first)
+            chunk_rewards, chunk_lengths = simulate(maze, algorithm.optimal_policy, size, first_rollout=first,
+                                                    max_steps=algorithm.max_steps)
+        else:
+            chunk_rewards, chunk_lengths = run_rollouts(maze, algorithm, range(first, first + 1), verbose=True)
+        for reward in chunk_rewards:
+            stats.add(reward)
+        rewards.extend(chunk_rewards)
+        lengths.extend(chunk_lengths)
+
+        if len(rewards) < min_rollouts:
+            continue
+        low, high = stats.interval()
+        if ci_width is not None and high - low <= ci_width:
+            break
+        if time_budget is not None and time.perf_counter() - start_time >= time_budget:
+            logging.info("Time budget ran out after %d rollouts.", len(rewards))
+            break
+    return np.array(rewards), np.array(lengths)
+
+def run_worker_rollouts(handle, alg_clas, rollouts, policy_codes=None, max_steps=None):
+    """Runs the given rollouts on the maze shared under handle (see Maze.share), used by the worker processes.
+    With policy_codes (see solution_cache.encode_policy) the policy solved by the parent process is followed,
+    otherwise alg_clas is an online planner like ffreplan and is created here."""
+    maze = Maze.attach(handle)
+    try:
+        if policy_codes is None:
+            algorithm = alg_clas(maze)
+        else:
+            algorithm = SolvedPolicy(maze, None, decode_policy(policy_codes, maze.get_actions()), None)
+            algorithm.max_steps = max_steps
+        rewards, lengths = run_rollouts(maze, algorithm, rollouts)
+        return rewards, lengths, replan_stats(algorithm, len(rollouts))
+    finally:
+        maze.close()
+
+def summarize(rewards, lengths, iterations, solve_time, rollout_time):
+    stats = RunningStats()
+    for reward in rewards:
+        stats.add(reward)
+    low, high = stats.interval()
+    return {'Total Reward': float(np.average(rewards)), 'CI low': low, 'CI high': high,
+            'Reward std': float(np.std(rewards)), 'Episode length': float(np.average(lengths)),
+            'Iterations': iterations, 'Rollouts': len(rewards), 'Solve time': solve_time,
+            'Rollout time': rollout_time}
+
+def learning_stats(algorithm):
+    """Samples used by the model-free learners, to compare their learning with the planners."""
+    if not isinstance(algorithm, QLearning):
+        return {}
+    return {'Samples': algorithm.samples, 'Samples per second': algorithm.samples_per_second,
+            'Converged': algorithm.converged}
+
+def replan_stats(algorithm, rollouts):
+    """Replans per episode of ffreplan over the given number of rollouts it executed."""
+    if not isinstance(algorithm, ffreplan) or not rollouts:
+        return {}
+    return {'Replans per episode': algorithm.replans / rollouts}
+
+def validate_single_maze(maze_path, alg_clas, batched=False, workers=1, log=None, rollout_batch=None, alg_name=None,
+                         metrics=None, profile=None, ci_width=None, time_budget=None, exact=False):
+    """Runs algorithm multiple times to get information about the average rewards.
+    With batched=True the algorithm has to provide a fixed optimal_policy,
+    all rollouts are then simulated at once.
+    With workers > 1 the maze is solved once here and the rollouts are split between
+    processes reading it from shared memory, which follow the solved policy (online
+    planners like ffreplan are created in each of them). Seeds stay per rollout, so
+    the rewards match the serial run.
+    With a ResultsLog and rollout_batch, the rewards of every rollout_batch rollouts are
+    logged as they finish and batches already in the log are not run again (not with workers > 1).
+    A metrics.Metrics given as metrics is attached to the maze and collects the
+    counters and phase times of this process, the rollouts of workers are not in them.
+    With a file name as profile, the validation in this process runs under cProfile
+    and the stats are dumped there.
+    With ci_width or time_budget the evaluation is adaptive: rollouts stop once the 95%
+    confidence interval of the average reward is ci_width wide or time_budget seconds
+    are spent, num_rollouts is only the upper limit (see run_adaptive_rollouts). Adaptive
+    evaluations run in this process and are not logged per batch.
+    The results hold the rollouts used and the confidence interval next to the Total Reward.
+    With exact=True no rollouts are run, the expected reward and episode length of the
+    policy the algorithm follows are solved exactly (see policy_evaluation.evaluate_policy)."""
+    if profile is not None:
+        if workers > 1:
+            logging.warning("Only the parent process is profiled, not the rollouts of the %d workers.", workers)
+        profiler = cProfile.Profile()
+        result = profiler.runcall(validate_single_maze, maze_path, alg_clas, batched, workers, log, rollout_batch,
+                                  alg_name, metrics, None, ci_width, time_budget, exact)
+        profiler.dump_stats(profile)
+        logging.info("Profile is saved to: %s", profile)
+        return result
+    logging.info("Running validation for: %s", maze_path)
+    adaptive = ci_width is not None or time_budget is not None
+    start_time = time.perf_counter()
+    with phase(metrics, 'load'):
+        maze = Maze(maze_path)
+    maze.metrics = metrics
+    with phase(metrics, 'solve'):
+        algorithm = alg_clas(maze)
+    solve_time = time.perf_counter() - start_time
+    if workers > 1 and not batched and not adaptive and not exact:
+        if log is not None and rollout_batch is not None:
+            logging.warning("Rollout batches are not logged with %d rollout workers, running all rollouts.", workers)
+        if metrics is not None:
+            logging.warning("Metrics only cover loading and solving, not the rollouts of the %d workers.", workers)
+        # the workers follow the policy solved here, only online planners are created by each of them
+        policy_codes, max_steps = None, None
+        if isinstance(algorithm, PolicySolver):
+            policy_codes, max_steps = encode_policy(algorithm.optimal_policy, maze.get_actions()), algorithm.max_steps
+        chunks = [range(start, num_rollouts, workers) for start in range(workers)]
+        start_time = time.perf_counter()
+        block, handle = maze.share()
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(run_worker_rollouts, [handle] * workers, [alg_clas] * workers, chunks,
+                                            [policy_codes] * workers, [max_steps] * workers))
+        finally:
+            block.close()
+            block.unlink()
+        rewards, lengths = np.zeros(num_rollouts), np.zeros(num_rollouts)
+        for start, (chunk_rewards, chunk_lengths, _) in enumerate(results):
+            rewards[start::workers] = chunk_rewards
+            lengths[start::workers] = chunk_lengths
+        stats = {}
+        for key in results[0][2]:
+            # the workers ran chunks of different sizes, weight their averages
+            stats[key] = sum(r[2][key] * len(chunk) for r, chunk in zip(results, chunks)) / num_rollouts
+        return dict(summarize(rewards, lengths, algorithm.get_iterations(), solve_time,
+                              time.perf_counter() - start_time), **learning_stats(algorithm), **stats)
+    start_time = time.perf_counter()
+    if exact:
+        with phase(metrics, 'evaluation'):
+            reward, length = evaluate_policy(maze, stationary_policy(maze, algorithm))
+        # summarize keeps the std of the single sample at 0, but its interval is unbounded
+        result = summarize([reward], [length], algorithm.get_iterations(), solve_time, time.perf_counter() - start_time)
+        result.update({'Rollouts': 0, 'CI low': reward, 'CI high': reward})
+        return dict(result, **learning_stats(algorithm))
+    if adaptive:
+        with phase(metrics, 'rollouts'):
+            rewards, lengths = run_adaptive_rollouts(maze, algorithm, ci_width, time_budget, batched)
+        if not batched:
+            print()
+        return dict(summarize(rewards, lengths, algorithm.get_iterations(), solve_time,
+                              time.perf_counter() - start_time), **learning_stats(algorithm),
+                    **replan_stats(algorithm, len(rewards)))
+    if batched:
+        rewards, lengths = simulate(maze, algorithm.optimal_policy, num_rollouts, max_steps=algorithm.max_steps)
+        return dict(summarize(rewards, lengths, algorithm.get_iterations(), solve_time,
+                              time.perf_counter() - start_time), **learning_stats(algorithm))
+
+    if log is None or rollout_batch is None:
+        rollout_batch = num_rollouts
+    done = {}
+    if rollout_batch < num_rollouts:
+        key = {'Maze hash': maze_hash(maze_path), 'Algorithm': alg_name, 'Parameters': describe_algorithm(alg_clas, batched)}
+        done = {record['First rollout']: record for record in log.find(kind="batch", **key)}
+
+    rewards, lengths = np.zeros(num_rollouts), np.zeros(num_rollouts)
+    executed = 0
+    for first in range(0, num_rollouts, rollout_batch):
+        rollouts = range(first, min(first + rollout_batch, num_rollouts))
+        if first in done:
+            rewards[rollouts.start:rollouts.stop] = done[first]['Rewards']
+            lengths[rollouts.start:rollouts.stop] = done[first]['Lengths']
+            continue
+        executed += len(rollouts)
+        with phase(metrics, 'rollouts'):
+            rewards[rollouts.start:rollouts.stop], lengths[rollouts.start:rollouts.stop] = run_rollouts(maze, algorithm, rollouts, verbose=True)
+        if rollout_batch < num_rollouts:
+            log.append(dict(key, **{'First rollout': first, 'Rewards': rewards[rollouts.start:rollouts.stop].tolist(),
+                                    'Lengths': lengths[rollouts.start:rollouts.stop].tolist()}), kind="batch")
     print()
-    return (np.average(rewards), algorithm.get_iterations())
+    return dict(summarize(rewards, lengths, algorithm.get_iterations(), solve_time, time.perf_counter() - start_time),
+                **learning_stats(algorithm), **replan_stats(algorithm, executed))
 
 def extract_number(fname):
     return int(fname.split('-')[1])
 
-def validate_alg(dataset_path, out_folder, alg_name, alg):
+def validate_alg(dataset_path, out_folder, alg_name, alg, batched=False, workers=1, rollout_workers=1,
+                 log_path=None, rollout_batch=None, ci_width=None, time_budget=None, exact=False):
     """Runs algorithm on each maze in dataset.
-    Saves the average rewards into .csv file."""
+    Saves the average rewards into .csv file.
+    With workers > 1 the mazes are spread over a process pool, the largest ones
+    are submitted first. The algorithm has to be picklable then, e.g. a class
+    or a functools.partial instead of a lambda.
+    With log_path (.jsonl or .csv) every maze is appended to the log as soon as it
+    finishes, mazes already logged with the same algorithm and parameters are skipped,
+    so an interrupted sweep can be resumed by running it again. Rollout batches need a .jsonl log.
+    ci_width and time_budget make the evaluation of every maze adaptive, exact=True replaces
+    the rollouts with the exact expected rewards, see validate_single_maze."""
+    log = ResultsLog(log_path) if log_path is not None else None
+    if log is not None and rollout_batch is not None and not log.jsonl:
+        raise ValueError("Rollout batches can only be logged into a .jsonl log.")
     if not os.path.exists(out_folder):
         os.mkdir(out_folder)
 
     mazes = list(filter(lambda maze: "maze" in maze,os.listdir(dataset_path)))
     mazes.sort(key=lambda x: int(x.split('-')[1]))
     logging.info("Getting rewards for algorithm %s", alg_name)
-    results = list(map(lambda maze: validate_single_maze(os.path.join(dataset_path, maze), alg), mazes))
-    all_rewards = list(map(lambda r: r[0], results))
-    iters = list(map(lambda r: r[1], results))
-    data = {'Maze file': mazes, 'Total Reward': all_rewards, 'Iterations': iters}
-    df = pd.DataFrame(data)
-    df.sort_values(by='Maze file')
+
+    parameters = describe_algorithm(alg, batched, ci_width, time_budget, exact)
+    keys = {maze: {'Maze file': maze, 'Maze hash': maze_hash(os.path.join(dataset_path, maze)),
+                   'Algorithm': alg_name, 'Parameters': parameters} for maze in mazes}
+    results = {}
+    if log is not None:
+        for maze in mazes:
+            logged = log.find(**{k: v for k, v in keys[maze].items() if k != 'Maze file'})
+            if logged:
+                logging.info("Skipping %s, already in %s", maze, log_path)
+                results[maze] = logged[-1]
+    todo = [maze for maze in mazes if maze not in results]
+
+    def finished(maze, result):
+        results[maze] = dict(keys[maze], **result)
+        if log is not None:
+            log.append(results[maze])
+
+    if workers > 1:
+        by_size = sorted(todo, key=lambda maze: os.path.getsize(os.path.join(dataset_path, maze)), reverse=True)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(validate_single_maze, os.path.join(dataset_path, maze), alg, batched,
+                                       rollout_workers, log, rollout_batch, alg_name, ci_width=ci_width,
+                                       time_budget=time_budget, exact=exact): maze
+                       for maze in by_size}
+            for future in as_completed(futures):
+                finished(futures[future], future.result())
+    else:
+        for maze in todo:
+            finished(maze, validate_single_maze(os.path.join(dataset_path, maze), alg, batched, rollout_workers,
+                                                log, rollout_batch, alg_name, ci_width=ci_width,
+                                                time_budget=time_budget, exact=exact))
+
+    df = pd.DataFrame([results[maze] for maze in mazes])
+    # the learners also report their samples, results logged before the intervals have none
+    df = df[['Maze file', 'Total Reward', 'Iterations'] + [column for column in ('Rollouts', 'CI low', 'CI high',
+                                                                                 'Samples', 'Samples per second',
+                                                                                 'Replans per episode')
+                                                           if column in df]]
     out_fname =os.path.join(out_folder, alg_name + ".csv")
     df.to_csv(out_fname, index=False)
     logging.info("Logs are saved to: %s", out_fname)
     logging.info("Finished validation.")
 
-def compare_vi_and_shortest_path(dataset_path, out_folder):
-    """Overlays policy of value iteration and shortest path to hightlight the differentces."""
+def validate_vi_batch(dataset_path, out_folder, alg_name="batch_vi", discount_factor=0.99999, epsilon=0.1,
+                      batched=False, max_batch_states=10 ** 6):
+    """Like validate_alg with vectorized value iteration, but solves the mazes in batches.
+    Mazes are batched in the order of their size until a batch holds max_batch_states states,
+    the policies are the same as solving the mazes one by one."""
+    if not os.path.exists(out_folder):
+        os.mkdir(out_folder)
+
+    mazes = list(filter(lambda maze: "maze" in maze,os.listdir(dataset_path)))
+    mazes.sort(key=lambda x: int(x.split('-')[1]))
+    logging.info("Getting rewards for algorithm %s", alg_name)
+
+    batches = [[]]
+    batch_states = 0
+    for maze_fname in mazes:
+        maze = Maze(os.path.join(dataset_path, maze_fname))
+        if batches[-1] and batch_states + maze.get_model().n_states > max_batch_states:
+            batches.append([])
+            batch_states = 0
+        batches[-1].append((maze_fname, maze))
+        batch_states += maze.get_model().n_states
+
+    rows = []
+    for batch in batches:
+        alg = BatchValueIteration([maze for _, maze in batch], discount_factor, epsilon)
+        logging.info("Solved %d mazes in %.2f s", len(batch), alg.solve_time)
+        for (maze_fname, maze), solver in zip(batch, alg.solvers()):
+            if batched:
+                rewards, _ = simulate(maze, solver.optimal_policy, num_rollouts)
+            else:
+                rewards, _ = run_rollouts(maze, solver, range(num_rollouts))
+            rows.append({'Maze file': maze_fname, 'Total Reward': float(np.average(rewards)),
+                         'Iterations': solver.get_iterations()})
+    out_fname = os.path.join(out_folder, alg_name + ".csv")
+    pd.DataFrame(rows).to_csv(out_fname, index=False)
+    logging.info("Logs are saved to: %s", out_fname)
+
+def compare_vi_modes(dataset_path, out_folder, modes=ValueIteration.modes):
+    """Solves each maze in dataset with every value iteration mode.
+    Saves the performed backups and solve times into .csv file."""
+    if not os.path.exists(out_folder):
+        os.mkdir(out_folder)
+
+    mazes = list(filter(lambda maze: "maze" in maze,os.listdir(dataset_path)))
+    mazes.sort(key=lambda x: int(x.split('-')[1]))
+    rows = []
+    for maze_fname in mazes:
+        for mode in modes:
+            logging.info("Solving %s with value iteration mode %s", maze_fname, mode)
+            alg = ValueIteration(Maze(os.path.join(dataset_path, maze_fname)), mode=mode)
+            rows.append({'Maze file': maze_fname, 'Mode': mode, 'Iterations': alg.get_iterations(),
+                         'Backups': alg.backups, 'Solve time': alg.solve_time})
+    out_fname = os.path.join(out_folder, "vi_modes.csv")
+    pd.DataFrame(rows).to_csv(out_fname, index=False)
+    logging.info("Logs are saved to: %s", out_fname)
+
+def sweep_vi(dataset_path, out_folder, discount_factors, epsilons, alg_name="async_vi", mode="async",
+             batched=False, cache=None):
+    """Runs value iteration on each maze in dataset for every discount factor and epsilon.
+    The settings of a maze are solved together, warm-started from each other (see solve_sweep).
+    Saves the average rewards of every setting into alg_name_discount_epsilon.csv."""
+    if not os.path.exists(out_folder):
+        os.mkdir(out_folder)
+
+    mazes = list(filter(lambda maze: "maze" in maze,os.listdir(dataset_path)))
+    mazes.sort(key=lambda x: int(x.split('-')[1]))
+    results = {}
+    for maze_fname in mazes:
+        logging.info("Solving %s for %d settings", maze_fname, len(discount_factors) * len(epsilons))
+        maze = Maze(os.path.join(dataset_path, maze_fname))
+        for setting, alg in solve_sweep(maze, discount_factors, epsilons, mode, cache=cache).items():
+            if batched:
+                rewards, _ = simulate(maze, alg.optimal_policy, num_rollouts)
+            else:
+                rewards, _ = run_rollouts(maze, alg, range(num_rollouts))
+            results.setdefault(setting, []).append({'Maze file': maze_fname, 'Total Reward': float(np.average(rewards)),
+                                                    'Iterations': alg.get_iterations()})
+    for (discount_factor, epsilon), rows in results.items():
+        out_fname = os.path.join(out_folder, f"{alg_name}_{discount_factor}_{epsilon}.csv")
+        pd.DataFrame(rows).to_csv(out_fname, index=False)
+        logging.info("Logs are saved to: %s", out_fname)
+
+def compare_vi_and_shortest_path(dataset_path, out_folder, cache=None, headless=False, workers=1):
+    """Overlays policy of value iteration and shortest path to hightlight the differentces.
+    With headless=True the images are rendered into .png files without Tk."""
+    if headless:
+        render.render_dataset(dataset_path, out_folder, "compare", workers, cache)
+        return
     if not os.path.exists(out_folder):
         os.mkdir(out_folder)
 
@@ -60,15 +410,19 @@ def compare_vi_and_shortest_path(dataset_path, out_folder):
         logging.info("Creating comparison of vi and shortest path for maze: %s", maze_name)
         maze = Maze(os.path.join(dataset_path, maze_fname), vis=True)
         maze.draw_maze()
-        alg = ValueIteration(maze, discount_factor=1)
+        alg = ValueIteration(maze, discount_factor=1, cache=cache)
         maze.visualize_path(ffreplan(maze).path)
         maze.visualize_opt_policy(alg.optimal_policy)
         maze.save_vis(os.path.join(out_folder, maze_name + "_compare"))
         maze.window.destroy()
 
 
-def show_ff_replan(dataset_path, out_folder):
-    """Shows how ff_replan behaved on all mazes presented in a directory."""
+def show_ff_replan(dataset_path, out_folder, headless=False, workers=1):
+    """Shows how ff_replan behaved on all mazes presented in a directory.
+    With headless=True the images are rendered into .png files without Tk."""
+    if headless:
+        render.render_dataset(dataset_path, out_folder, "ffreplan", workers)
+        return
     if not os.path.exists(out_folder):
         os.mkdir(out_folder)
 
@@ -84,8 +438,12 @@ def show_ff_replan(dataset_path, out_folder):
         maze.save_vis(os.path.join(out_folder, maze_name + "_ffreplan"))
         maze.window.destroy()
 
-def mazes_vis(dataset_path, out_folder):
-    """Prepare pictures of plain mazes."""
+def mazes_vis(dataset_path, out_folder, headless=False, workers=1):
+    """Prepare pictures of plain mazes.
+    With headless=True the images are rendered into .png files without Tk."""
+    if headless:
+        render.render_dataset(dataset_path, out_folder, "maze", workers)
+        return
     if not os.path.exists(out_folder):
         os.mkdir(out_folder)
 
@@ -105,15 +463,24 @@ if __name__=="__main__":
 
     dataset = "one_maze_test"
 
-    show_ff_replan(dataset, "logs")
+    # solved value functions are reused between runs
+    cache = SolutionCache("cache")
+
+    show_ff_replan(dataset, "logs", headless=True)
 
-    compare_vi_and_shortest_path(dataset, "logs")
+    compare_vi_and_shortest_path(dataset, "logs", cache, headless=True)
 
     # collects rewards for ffreplan
     validate_alg(dataset, 'logs', "ffreplan", ffreplan)
 
     # collects rewards for valueiteration
-    validate_alg(dataset, 'logs', "async_vi", ValueIteration)
+    validate_alg(dataset, 'logs', "async_vi", partial(ValueIteration, cache=cache))
+
+    # collects rewards for LRTDP, which only backs up the states relevant from the start
+    validate_alg(dataset, 'logs', "lrtdp", LRTDP)
+
+    # collects rewards for Q-learning, which learns from the moves only, iterations are episodes
+    validate_alg(dataset, 'logs', "qlearning", QLearning)
 
     vi = "logs/async_vi.csv"
     replan = "logs/ffreplan.csv"
@@ -2,75 +2,204 @@ import tkinter as tk
 import random
 from PIL import Image
 import logging
+from multiprocessing import shared_memory
 import numpy as np
 
+from maze_model import MazeModel, CorridorGraph
+
+# cell types of Maze.grid
+FREE, WALL, START, END, DELAY = range(5)
+CELL_CHARS = np.array([' ', '#', 'S', 'E', 'D'])
+CELL_CODES = np.full(256, FREE, dtype=np.uint8)
+for code, char in enumerate(CELL_CHARS):
+    CELL_CODES[ord(char)] = code
+
 class Maze:
-    def __init__(self, maze_name, vis=False):
+    """The grid of a maze, read from maze_name unless the grid is given.
+
+    The maze itself is not changed by moving through it, the position of an episode
+    is kept by an Agent. The maze has one agent of its own, which cur_row, cur_col,
+    steps, trajectory, move() and reset() refer to; new_agent() adds more agents
+    moving through the same maze at the same time.
+    """
+    def __init__(self, maze_name, vis=False, grid=None, shared_memory=None):
         self.cell_size = 20
         self.maze_name = maze_name
-        self.maze = []
-        self.cur_row, self.cur_col = None, None
+        self.maze_view = None
         self.start_row, self.start_col = None, None
         self.end_row, self.end_col = None, None
-        self.__read_maze__()
+        self.model = None
+        self.abstraction = None
+        # the shared memory block of the grid of an attached maze
+        self.shared_memory = shared_memory
+        # set to a metrics.Metrics to count the moves and wall hits
+        self.metrics = None
+        if grid is None:
+            self.__read_maze__()
+        else:
+            self.__set_grid__(grid)
 
         self.actions = ["left", "right", "up", "down"]
+        self.agent = Agent(self)
 
         self.vis = vis
         if self.vis:
             self.window = tk.Tk()
-            self.canvas = tk.Canvas(self.window, width=len(self.maze[0]) * 20, height=len(self.maze) * 20)
+            self.canvas = tk.Canvas(self.window, width=self.num_cols * 20, height=self.num_rows * 20)
             self.canvas.pack()
             self.draw_maze()
     
     def at_the_start(self):
-        return self.start_col == self.cur_col and self.start_row == self.cur_row
+        return self.agent.at_the_start()
+
+    @property
+    def cur_row(self):
+        return self.agent.cur_row
+
+    @cur_row.setter
+    def cur_row(self, row):
+        self.agent.cur_row = row
+
+    @property
+    def cur_col(self):
+        return self.agent.cur_col
+
+    @cur_col.setter
+    def cur_col(self, col):
+        self.agent.cur_col = col
+
+    @property
+    def steps(self):
+        return self.agent.steps
+
+    @property
+    def trajectory(self):
+        return self.agent.trajectory
+
+    @trajectory.setter
+    def trajectory(self, trajectory):
+        self.agent.trajectory = trajectory
+
+    def new_agent(self, rng=None):
+        """A new agent at the start of the maze, see Agent."""
+        return Agent(self, rng)
 
     def __read_maze__(self):
-        with open(self.maze_name, 'r') as file:
-            file.readline()
-            for row, line in enumerate(file):
-                maze_row = list(line.strip())
-                if 'S' in maze_row:
-                    self.cur_row = row
-                    self.cur_col = maze_row.index('S')
-                    self.start_row = row
-                    self.start_col = maze_row.index('S')
-                if 'E' in maze_row:
-                    self.end_row = row
-                    self.end_col = maze_row.index('E')
-                self.maze.append(maze_row)
+        with open(self.maze_name, 'rb') as file:
+            header = file.readline().split()
+            data = file.read().replace(b'\r', b'')
+        num_rows, num_cols = int(header[0]), int(header[1])
+
+        # rows of exactly num_cols characters can be cut out of the bytes directly
+        chars = np.frombuffer(data, dtype=np.uint8)
+        line_length = num_cols + 1
+        if len(chars) in (num_rows * line_length, num_rows * line_length - 1):
+            chars = np.append(chars, np.uint8(ord('\n'))) if len(chars) % line_length else chars
+            lines = chars.reshape(num_rows, line_length)
+            if not np.all(lines[:, -1] == ord('\n')) or np.any(lines[:, :-1] == ord('\n')):
+                lines = None
+        else:
+            lines = None
+
+        if lines is not None:
+            self.grid = CELL_CODES[lines[:, :-1]]
+        else:
+            # irregular file, fall back to parsing line by line, short rows are padded with walls
+            rows = [line.strip() for line in data.split(b'\n')]
+            while rows and not rows[-1]:
+                rows.pop()
+            num_cols = max(map(len, rows), default=0)
+            self.grid = np.full((len(rows), num_cols), WALL, dtype=np.uint8)
+            for row, line in enumerate(rows):
+                self.grid[row, :len(line)] = CELL_CODES[np.frombuffer(line, dtype=np.uint8)]
+        self.__set_grid__(self.grid)
+
+    def __set_grid__(self, grid):
+        self.grid = grid
+        self.num_rows, self.num_cols = self.grid.shape
+        if self.shared_memory is None:
+            # flat copy for fast scalar lookups in the hot paths
+            self.cells = self.grid.tobytes()
+        else:
+            # the same lookups straight from the shared memory
+            self.cells = self.shared_memory.buf[:self.grid.size]
+
+        starts = np.flatnonzero(self.grid == START)
+        if len(starts):
+            self.start_index = int(starts[0])
+            self.start_row, self.start_col = divmod(self.start_index, self.num_cols)
+        ends = np.flatnonzero(self.grid == END)
+        if len(ends):
+            self.end_index = int(ends[0])
+            self.end_row, self.end_col = divmod(self.end_index, self.num_cols)
+
+    @property
+    def walls(self):
+        return self.grid == WALL
+
+    @property
+    def delays(self):
+        return self.grid == DELAY
+
+    @property
+    def goal(self):
+        return self.grid == END
+
+    def share(self):
+        """Copies the grid into a new shared memory block, returns the block and the handle to attach to it.
+
+        The handle pickles to a few bytes, so it can be passed to worker processes,
+        which then read the maze without loading or copying it. The caller owns the
+        block and has to close() and unlink() it once the workers are done.
+        """
+        block = shared_memory.SharedMemory(create=True, size=max(self.grid.size, 1))
+        np.ndarray(self.grid.shape, dtype=np.uint8, buffer=block.buf)[:] = self.grid
+        return block, (block.name, self.grid.shape, self.maze_name)
+
+    @classmethod
+    def attach(cls, handle, vis=False):
+        """The maze whose grid was shared under handle, see share()."""
+        name, shape, maze_name = handle
+        block = shared_memory.SharedMemory(name=name)
+        grid = np.ndarray(shape, dtype=np.uint8, buffer=block.buf)
+        grid.flags.writeable = False
+        return cls(maze_name, vis, grid, block)
+
+    def close(self):
+        """Detaches an attached maze from its shared memory, the maze can't be used afterwards."""
+        if self.shared_memory is not None:
+            self.grid = self.cells = self.maze_view = None
+            self.shared_memory.close()
+            self.shared_memory = None
+
+    @property
+    def maze(self):
+        """The grid as a list of rows of characters, built on first access."""
+        if self.maze_view is None:
+            self.maze_view = CELL_CHARS[self.grid].tolist()
+        return self.maze_view
     
     def reset(self):
-        self.cur_col = self.start_col
-        self.cur_row = self.start_row
+        self.agent.reset()
 
     def draw_maze(self):
         if not self.vis:
             logging.error("Visualizing, you didn't wanted to.")
             return 
 
-        for row in range(len(self.maze)):
-            for col in range(len(self.maze[0])):
-                x1 = col * self.cell_size
-                y1 = row * self.cell_size
-                x2 = x1 + self.cell_size
-                y2 = y1 + self.cell_size
-
-                if self.maze[row][col] == '#':
-                    self.canvas.create_rectangle(x1, y1, x2, y2, fill='black')
-                elif self.maze[row][col] == 'S':
-                    self.canvas.create_rectangle(x1, y1, x2, y2, fill='green')
-                elif self.maze[row][col] == 'E':
-                    self.canvas.create_rectangle(x1, y1, x2, y2, fill='red')
-                elif self.maze[row][col] == 'D':
-                    self.canvas.create_rectangle(x1, y1, x2, y2, fill='orange')
+        colors = {WALL: 'black', START: 'green', END: 'red', DELAY: 'orange'}
+        for row, col in zip(*np.nonzero(self.grid != FREE)):
+            x1 = col * self.cell_size
+            y1 = row * self.cell_size
+            x2 = x1 + self.cell_size
+            y2 = y1 + self.cell_size
+            self.canvas.create_rectangle(x1, y1, x2, y2, fill=colors[self.grid[row, col]])
 
     def get_position(self):
-        return (self.cur_row, self.cur_col)
+        return self.agent.get_position()
     
     def goal_reached(self):
-        return self.cur_row == self.end_row and self.cur_col == self.end_col
+        return self.agent.goal_reached()
 
     def is_goal(self, pos):
         row, col = pos
@@ -83,6 +212,18 @@ class Maze:
     def get_actions(self):
         return self.actions
 
+    def get_model(self):
+        """Compiled transition model, built on the first call and cached afterwards."""
+        if self.model is None:
+            self.model = MazeModel(self)
+        return self.model
+
+    def get_abstraction(self):
+        """Junctions, dead ends and corridors of the maze, built on the first call and cached afterwards."""
+        if self.abstraction is None:
+            self.abstraction = CorridorGraph(self.get_model())
+        return self.abstraction
+
     def get_action_results(self, action, pos):
         row, col = pos
         if action == "left":
@@ -120,26 +261,13 @@ class Maze:
         image.save(fname + '.png', 'png')
     
     def next_to_direction(self, move):
-        row, col = move
-        # Check if the given position is adjacent to the current position
-        if (row == self.cur_row and abs(col - self.cur_col) == 1) or \
-                (col == self.cur_col and abs(row - self.cur_row) == 1):
-            # Determine the direction based on the relative position
-            if row < self.cur_row:
-                return 'up'
-            elif row > self.cur_row:
-                return 'down'
-            elif col < self.cur_col:
-                return 'left'
-            elif col > self.cur_col:
-                return 'right'
-        return None
+        return self.agent.next_to_direction(move)
     
     def get_reward(self, move):
         row, col = move
         if row == self.end_row and col == self.end_col:
             return 200
-        elif self.maze[row][col] == 'D':
+        elif self.cells[row * self.num_cols + col] == DELAY:
             return -50
         else:
             return -1
@@ -174,17 +302,17 @@ class Maze:
 
         self.canvas.create_line(x1, y1, x2, y2, arrow=tk.LAST, fill=color)
     
-    def draw_move(self, direction, succesfull):
+    def draw_move(self, pos, direction, succesfull):
         if succesfull:
             color = "black"
         else:
             color = "red"
-        self.draw_arrow_in_pos((self.cur_row, self.cur_col), direction, color)
+        self.draw_arrow_in_pos(pos, direction, color)
     
     def visualize_opt_policy(self, optimal_policy):
         num_rows = len(optimal_policy)
         num_cols = len(optimal_policy[0])
-        if len(self.maze) == num_rows and len(self.maze[0]) == num_cols:
+        if self.num_rows == num_rows and self.num_cols == num_cols:
             for row in range(num_rows):
                 for col in range(num_cols):
                     if optimal_policy[row][col] == "#":
@@ -194,11 +322,66 @@ class Maze:
         else:
             logging.error("Optimal policy and maze don't have the same dimensions.")
 
+
+    def move(self, direction):
+        return self.agent.move(direction)
+
+
+class Agent():
+    """Position and step count of one episode in a maze.
+
+    The maze is only read, so any number of agents can move through one loaded maze
+    at the same time. The slips are drawn from rng, the random module unless given,
+    e.g. a random.Random(seed) per agent for rollouts independent of each other.
+    """
+    __slots__ = ('maze', 'rng', 'cur_row', 'cur_col', 'steps', 'trajectory')
+
+    def __init__(self, maze, rng=None):
+        self.maze = maze
+        self.rng = rng or random
+        # set to a list to record the moves as (position, direction, successful)
+        self.trajectory = None
+        self.reset()
+
+    def reset(self):
+        self.cur_row, self.cur_col = self.maze.start_row, self.maze.start_col
+        # moves since the last reset
+        self.steps = 0
+
+    def get_position(self):
+        return (self.cur_row, self.cur_col)
+
+    def at_the_start(self):
+        return self.maze.start_col == self.cur_col and self.maze.start_row == self.cur_row
+
+    def goal_reached(self):
+        return self.cur_row == self.maze.end_row and self.cur_col == self.maze.end_col
+
+    def next_to_direction(self, move):
+        row, col = move
+        # Check if the given position is adjacent to the current position
+        if (row == self.cur_row and abs(col - self.cur_col) == 1) or \
+                (col == self.cur_col and abs(row - self.cur_row) == 1):
+            # Determine the direction based on the relative position
+            if row < self.cur_row:
+                return 'up'
+            elif row > self.cur_row:
+                return 'down'
+            elif col < self.cur_col:
+                return 'left'
+            elif col > self.cur_col:
+                return 'right'
+        return None
+
     def move(self, direction):
+        maze = self.maze
         row, col = self.cur_row, self.cur_col
+        self.steps += 1
+        if maze.metrics is not None:
+            maze.metrics.count('moves')
         
         successful = False
-        if random.random() < 0.7:  # Move in the given direction
+        if self.rng.random() < 0.7:  # Move in the given direction
             successful = True
             if direction == 'up':
                 row -= 1
@@ -208,7 +391,7 @@ class Maze:
                 col -= 1
             elif direction == 'right':
                 col += 1
-        elif random.random() < 0.5:  # Move left
+        elif self.rng.random() < 0.5:  # Move left
             if direction == 'up':
                 col -= 1
             elif direction == 'down':
@@ -227,19 +410,23 @@ class Maze:
             elif direction == 'right':
                 row += 1
 
-        if self.vis:
-            self.draw_move(self.next_to_direction((row, col)), successful)
+        if maze.vis:
+            maze.draw_move((self.cur_row, self.cur_col), self.next_to_direction((row, col)), successful)
+        if self.trajectory is not None:
+            self.trajectory.append(((self.cur_row, self.cur_col), self.next_to_direction((row, col)), successful))
         
         if (
             row < 0
-            or row >= len(self.maze)
+            or row >= maze.num_rows
             or col < 0
-            or col >= len(self.maze[0])
-            or self.maze[row][col] == '#'
+            or col >= maze.num_cols
+            or maze.cells[row * maze.num_cols + col] == WALL
         ):
             logging.debug("Wall was hit.")
+            if maze.metrics is not None:
+                maze.metrics.count('wall_hits')
             return -1
 
         self.cur_row, self.cur_col = row, col
 
-        return self.get_reward((row, col))
+        return maze.get_reward((row, col))
@@ -0,0 +1,76 @@
+import argparse
+import os
+import random
+
+
+def generate_maze(size, delay_density=0.05, loopiness=0.1, seed=0):
+    """Generates a random size x size maze as a list of rows in the format Maze reads.
+
+    Passages are carved by a randomized depth-first search between the odd fields,
+    which gives a perfect maze. loopiness is the fraction of the remaining inner
+    walls between two passages that is removed again to create loops, and
+    delay_density the fraction of free fields turned into delays. The start is in
+    the top left and the goal in the bottom right corner.
+    """
+    if size < 5 or size % 2 == 0:
+        raise ValueError("The maze size has to be an odd number of at least 5.")
+    rng = random.Random(seed)
+    grid = [bytearray(b'#' * size) for _ in range(size)]
+
+    grid[1][1] = ord(' ')
+    stack = [(1, 1)]
+    while stack:
+        row, col = stack[-1]
+        unvisited = [(row + d_row, col + d_col) for d_row, d_col in ((-2, 0), (2, 0), (0, -2), (0, 2))
+                     if 0 < row + d_row < size - 1 and 0 < col + d_col < size - 1
+                     and grid[row + d_row][col + d_col] == ord('#')]
+        if not unvisited:
+            stack.pop()
+            continue
+        next_row, next_col = rng.choice(unvisited)
+        grid[(row + next_row) // 2][(col + next_col) // 2] = ord(' ')
+        grid[next_row][next_col] = ord(' ')
+        stack.append((next_row, next_col))
+
+    # walls separating two passages either horizontally or vertically
+    for row in range(1, size - 1):
+        for col in range(1 + row % 2, size - 1, 2):
+            if grid[row][col] == ord('#') and rng.random() < loopiness:
+                grid[row][col] = ord(' ')
+
+    for row in range(1, size - 1):
+        for col in range(1, size - 1):
+            if grid[row][col] == ord(' ') and rng.random() < delay_density:
+                grid[row][col] = ord('D')
+
+    grid[1][1] = ord('S')
+    grid[size - 2][size - 2] = ord('E')
+    return [row.decode() for row in grid]
+
+
+def write_maze(rows, fname):
+    with open(fname, 'w') as file:
+        file.write(f"{len(rows)} {len(rows[0])}\n")
+        file.write('\n'.join(rows) + '\n')
+
+
+def generated_maze_path(folder, size, delay_density=0.05, loopiness=0.1, seed=0):
+    """Writes the generated maze into folder unless it is there already, returns its path."""
+    fname = os.path.join(folder, f"maze-{size}-gen-d{delay_density}-l{loopiness}-s{seed}.txt")
+    if not os.path.exists(fname):
+        if not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        write_maze(generate_maze(size, delay_density, loopiness, seed), fname)
+    return fname
+
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Generates random mazes.")
+    parser.add_argument("sizes", type=int, nargs='+')
+    parser.add_argument("--delay-density", type=float, default=0.05)
+    parser.add_argument("--loopiness", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="generated")
+    args = parser.parse_args()
+    for size in args.sizes:
+        print(generated_maze_path(args.out, size, args.delay_density, args.loopiness, args.seed))
@@ -0,0 +1,205 @@
+import heapq
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import spsolve
+
+
+class MazeModel():
+    """Compiled transition model of a maze.
+
+    Non-wall cells are numbered as states in row-major order. For every action the
+    model holds the three outcomes of the slip model with wall bounce-back already
+    applied, and a sparse transition matrix P[a] (states x states) together with
+    the expected immediate reward R[a]. Moving into the goal terminates, so those
+    transitions are left out of P[a] while their reward stays in R[a].
+    """
+    def __init__(self, maze):
+        num_rows, num_cols = maze.grid.shape
+        walls = maze.walls
+
+        self.shape = maze.grid.shape
+        self.actions = list(maze.get_actions())
+
+        self.state_index = np.full(self.shape, -1, dtype=np.int64)
+        self.rows, self.cols = np.nonzero(~walls)
+        self.n_states = len(self.rows)
+        self.state_index[self.rows, self.cols] = np.arange(self.n_states)
+        self.start_state = self.state_index[maze.start_row, maze.start_col]
+        self.goal_state = self.state_index[maze.end_row, maze.end_col]
+
+        rewards = np.full(self.shape, -1.0)
+        rewards[maze.delays] = -50
+        rewards[maze.end_row, maze.end_col] = 200
+
+        num_actions = len(self.actions)
+        states = np.arange(self.n_states)
+        self.outcome_probs = np.empty((num_actions, 3))
+        self.next_states = np.empty((num_actions, 3, self.n_states), dtype=np.int64)
+        self.outcome_rewards = np.empty((num_actions, 3, self.n_states))
+        self.terminal = np.empty((num_actions, 3, self.n_states), dtype=bool)
+        for a, action in enumerate(self.actions):
+            for k, (p, (d_row, d_col)) in enumerate(maze.get_action_results(action, (0, 0))):
+                next_rows, next_cols = self.rows + d_row, self.cols + d_col
+                inside = (next_rows >= 0) & (next_rows < num_rows) & (next_cols >= 0) & (next_cols < num_cols)
+                next_rows = np.where(inside, next_rows, 0)
+                next_cols = np.where(inside, next_cols, 0)
+                next_index = np.where(inside, self.state_index[next_rows, next_cols], -1)
+
+                self.outcome_probs[a, k] = p
+                # hit wall, not moving anywhere
+                self.next_states[a, k] = np.where(next_index >= 0, next_index, states)
+                # the reward is given for the attempted field, walls count as a plain step
+                self.outcome_rewards[a, k] = np.where(inside, rewards[next_rows, next_cols], -1.0)
+                # goal state terminates, bouncing off a wall in the goal does not
+                self.terminal[a, k] = next_index == self.goal_state
+
+        self.P = []
+        self.R = np.empty((num_actions, self.n_states))
+        for a in range(num_actions):
+            probs = np.broadcast_to(self.outcome_probs[a][:, None], self.next_states[a].shape)
+            keep = ~self.terminal[a]
+            self.P.append(sparse.csr_matrix(
+                (probs[keep], (np.broadcast_to(states, keep.shape)[keep], self.next_states[a][keep])),
+                shape=(self.n_states, self.n_states)))
+            self.R[a] = (probs * self.outcome_rewards[a]).sum(axis=0)
+
+        self.step_costs = np.where(maze.delays[self.rows, self.cols], 50, 1)
+        self.graph = None
+        self.cost_to_go = None
+
+    def get_graph(self):
+        """Deterministic move graph: neighbouring states of every state and the cost of entering a state.
+
+        Entering a delay costs 50, any other field 1, including the goal.
+        Built on the first call and cached, as plain lists for fast access in the planners.
+        """
+        if self.graph is None:
+            neighbours = [[] for _ in range(self.n_states)]
+            for a in range(len(self.actions)):
+                # the first outcome is the intended move
+                for state, next_state in enumerate(self.next_states[a, 0].tolist()):
+                    if next_state != state:
+                        neighbours[state].append(next_state)
+            self.graph = (neighbours, self.step_costs.tolist())
+        return self.graph
+
+    def get_cost_to_go(self):
+        """Cheapest deterministic cost from every state to the goal and the next state on that path.
+
+        Computed once with a backward Dijkstra search from the goal over get_graph().
+        Unreachable states have an infinite cost and successor -1.
+        """
+        if self.cost_to_go is None:
+            neighbours, step_costs = self.get_graph()
+            goal = int(self.goal_state)
+            distances = [float('inf')] * self.n_states
+            successors = [-1] * self.n_states
+            distances[goal] = 0
+            open_set = [(0, goal)]
+            while open_set:
+                distance, state = heapq.heappop(open_set)
+                if distance > distances[state]:
+                    continue
+                # moving from pred into state costs the step cost of state
+                pred_distance = distance + step_costs[state]
+                for pred in neighbours[state]:
+                    if pred_distance < distances[pred]:
+                        distances[pred] = pred_distance
+                        successors[pred] = state
+                        heapq.heappush(open_set, (pred_distance, pred))
+            self.cost_to_go = (distances, successors)
+        return self.cost_to_go
+
+    def shortest_path_policy(self):
+        """Action indices heading along the cheapest deterministic path, the moves ffreplan plans.
+
+        States that can't reach the goal take the first action.
+        """
+        _, successors = self.get_cost_to_go()
+        successors = np.array(successors)
+        policy = np.zeros(self.n_states, dtype=np.int64)
+        for a in reversed(range(len(self.actions))):
+            policy[self.next_states[a, 0] == successors] = a
+        return policy
+
+    def q_values(self, values, discount_factor):
+        """Action values for a state value vector, shape (actions, states)."""
+        return np.stack([self.R[a] + discount_factor * self.P[a].dot(values) for a in range(len(self.actions))])
+
+    def policy_model(self, policy):
+        """Transition matrix and reward vector of a stationary policy given as action indices."""
+        policy = np.asarray(policy)
+        states = np.arange(self.n_states)
+        P = sparse.csr_matrix((self.n_states, self.n_states))
+        for a in range(len(self.actions)):
+            chosen = sparse.diags((policy == a).astype(float))
+            P = P + chosen.dot(self.P[a])
+        return P.tocsr(), self.R[policy, states]
+
+    def policy_values(self, policy, discount_factor):
+        """Exact values of a stationary policy given as action indices, one sparse solve of (I - γP)V = R."""
+        P, R = self.policy_model(policy)
+        return spsolve((sparse.identity(self.n_states, format='csc') - discount_factor * P).tocsc(), R)
+
+    def action_indices(self, policy_grid):
+        """Converts a grid of action names into a vector of action indices per state."""
+        lookup = {action: a for a, action in enumerate(self.actions)}
+        return np.array([lookup[policy_grid[row][col]] for row, col in zip(self.rows, self.cols)], dtype=np.int64)
+
+    def to_grid(self, state_values, fill=0):
+        grid = np.full(self.shape, fill, dtype=np.asarray(state_values).dtype)
+        grid[self.rows, self.cols] = state_values
+        return grid
+
+    def policy_grid(self, policy):
+        """Converts a vector of action indices into the grid of action names used by Maze."""
+        actions = np.array(self.actions, dtype=object)
+        grid = np.full(self.shape, '#', dtype=object)
+        grid[self.rows, self.cols] = actions[np.asarray(policy)]
+        return grid.tolist()
+
+
+class CorridorGraph():
+    """Junctions, dead ends and corridors of a maze.
+
+    A state with exactly two free neighbours can only ever move into one of them or
+    stay, whatever the action and slip, so chains of such states form corridors that
+    are entered and left only at their two ends. All other states, plus the start and
+    the goal, are nodes. Every corridor is stored as its cells in order from node
+    ends[0] to node ends[1], nodes next to each other are not joined by a corridor.
+    States of corridors not ending in any node can't be reached from a node, they
+    are left out.
+    """
+    def __init__(self, model):
+        neighbours, _ = model.get_graph()
+        self.model = model
+        is_node = np.array([len(states) != 2 for states in neighbours], dtype=bool)
+        is_node[[model.start_state, model.goal_state]] = True
+        self.nodes = np.flatnonzero(is_node)
+        self.node_index = np.full(model.n_states, -1, dtype=np.int64)
+        self.node_index[self.nodes] = np.arange(len(self.nodes))
+
+        # corridor and position in it of every corridor state, -1 for nodes
+        self.corridor = np.full(model.n_states, -1, dtype=np.int64)
+        self.position = np.full(model.n_states, -1, dtype=np.int64)
+        self.corridors = []
+        self.ends = []
+        corridor, position = self.corridor.tolist(), self.position.tolist()
+        for node in self.nodes.tolist():
+            for state in neighbours[node]:
+                if is_node[state] or corridor[state] >= 0:
+                    continue
+                cells, previous = [], node
+                while not is_node[state]:
+                    corridor[state], position[state] = len(self.corridors), len(cells)
+                    cells.append(state)
+                    following = neighbours[state][0] if neighbours[state][0] != previous else neighbours[state][1]
+                    previous, state = state, following
+                self.corridors.append(np.array(cells, dtype=np.int64))
+                self.ends.append((node, state))
+        self.corridor[:], self.position[:] = corridor, position
+        self.ends = np.array(self.ends, dtype=np.int64).reshape(-1, 2)
+
+    def summary(self):
+        return (f"{len(self.nodes)} nodes and {len(self.corridors)} corridors "
+                f"instead of {self.model.n_states} states")
@@ -0,0 +1,78 @@
+import math
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+from scipy import stats
+
+
+class Metrics():
+    """Opt-in telemetry of a run: counters, seconds spent per phase and traces of values.
+
+    Attach it to a maze (maze.metrics = Metrics()) before creating the algorithm,
+    Maze.move, ValueIteration and ffreplan then report into it:
+        counters -- moves, wall_hits, sweeps, backups, cache_hits, expansions, plans, replans
+        timers   -- seconds per phase, e.g. model, value_iteration, policy, planning
+        traces   -- residual (Bellman residual of every sweep), replans_per_episode
+    Every update is guarded by a single `metrics is not None` check, so without
+    metrics the hot paths stay as they are.
+    """
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.timers = defaultdict(float)
+        self.traces = defaultdict(list)
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def record(self, name, value):
+        self.traces[name].append(value)
+
+    @contextmanager
+    def phase(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] += time.perf_counter() - start_time
+
+    def as_dict(self):
+        return {'counters': dict(self.counters), 'timers': dict(self.timers), 'traces': dict(self.traces)}
+
+    def summary(self):
+        lines = [f"{name:24} {value:12}" for name, value in sorted(self.counters.items())]
+        lines += [f"{name:24} {value:12.4f} s" for name, value in sorted(self.timers.items())]
+        for name, values in sorted(self.traces.items()):
+            if values:
+                lines.append(f"{name:24} {len(values):12} values, last {values[-1]:.5g}, max {max(values):.5g}")
+        return '\n'.join(lines)
+
+
+class RunningStats():
+    """Running mean and variance of a stream of values (Welford's algorithm)."""
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.squares = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.squares += delta * (value - self.mean)
+
+    def variance(self):
+        """Sample variance, 0 with less than two values."""
+        return self.squares / (self.count - 1) if self.count > 1 else 0.0
+
+    def interval(self, confidence=0.95):
+        """Student's t confidence interval of the mean, infinitely wide with less than two values."""
+        if self.count < 2:
+            return -math.inf, math.inf
+        half_width = float(stats.t.ppf((1 + confidence) / 2, self.count - 1)) * math.sqrt(self.variance() / self.count)
+        return self.mean - half_width, self.mean + half_width
+
+
+def phase(metrics, name):
+    """metrics.phase(name), or a context doing nothing when metrics is None."""
+    return nullcontext() if metrics is None else metrics.phase(name)
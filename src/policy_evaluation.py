@@ -0,0 +1,63 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import breadth_first_order
+from scipy.sparse.linalg import splu
+
+from maze import Maze
+from ffreplan import ffreplan
+
+
+def stationary_policy(maze: Maze, algorithm):
+    """Vector of action indices per state of the maze model that algorithm follows.
+
+    ffreplan heads along its cheapest deterministic path and replans from wherever
+    it ends up, which is the fixed policy of MazeModel.shortest_path_policy; it is
+    exactly the policy of planner="table", A* and D* Lite may break ties between
+    equally cheap paths differently. All other algorithms follow their optimal_policy.
+    """
+    model = maze.get_model()
+    if isinstance(algorithm, ffreplan):
+        return model.shortest_path_policy()
+    return model.action_indices(algorithm.optimal_policy)
+
+
+def evaluate_policy(maze: Maze, policy, discount_factor=1):
+    """Expected return and expected number of moves of an episode from the start, without sampling.
+
+    policy is a grid of action names (e.g. ValueIteration.optimal_policy) or a vector of
+    action indices per state, like in simulator.simulate. The episode is an absorbing
+    Markov chain ending in the goal, both expectations are solved from a sparse LU
+    factorization of I - P over the states the policy can reach from the start. The
+    return is undiscounted by default, the Total Reward of the rollouts; with a
+    discount_factor below 1 it is solved from I - γP, the length stays undiscounted.
+    If the policy can get stuck in states from which the goal is never reached, the
+    expected return is -inf and the length inf.
+    """
+    model = maze.get_model()
+    if isinstance(policy, np.ndarray) and policy.ndim == 1:
+        policy = policy.astype(np.int64)
+    else:
+        policy = model.action_indices(policy)
+    P, R = model.policy_model(policy)
+    P.eliminate_zeros()
+
+    # the rest of the probability of every state ends the episode in the goal
+    ends = np.asarray(P.sum(axis=1)).ravel() < 1 - 1e-12
+    reachable = np.sort(breadth_first_order(P, int(model.start_state), return_predecessors=False))
+    # states that can still end the episode, found backwards from the ones ending it
+    reversed_graph = sparse.vstack([P.T.tocsr(), sparse.csr_matrix(ends[None].astype(float))]).tocsr()
+    reversed_graph = sparse.hstack([reversed_graph, sparse.csr_matrix((model.n_states + 1, 1))]).tocsr()
+    finishing = breadth_first_order(reversed_graph, model.n_states, return_predecessors=False)
+    if not np.isin(reachable, finishing).all():
+        return -np.inf, np.inf
+
+    index = np.full(model.n_states, -1, dtype=np.int64)
+    index[reachable] = np.arange(len(reachable))
+    P = P[reachable][:, reachable]
+    identity = sparse.identity(len(reachable), format='csc')
+    start = index[model.start_state]
+    solution = splu((identity - P).tocsc()).solve(np.column_stack([R[reachable], np.ones(len(reachable))]))
+    expected_return, expected_length = solution[start]
+    if discount_factor != 1:
+        expected_return = splu((identity - discount_factor * P).tocsc()).solve(R[reachable])[start]
+    return float(expected_return), float(expected_length)
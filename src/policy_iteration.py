@@ -0,0 +1,64 @@
+from maze import Maze
+from policy_solver import PolicySolver
+import numpy as np
+from scipy.sparse import identity
+from scipy.sparse.linalg import spsolve
+import logging
+import time
+
+class PolicyIteration(PolicySolver):
+    """Solves the maze with policy iteration over the compiled maze model.
+
+    Each policy is evaluated with one sparse linear solve over the non-wall states.
+    With evaluation_sweeps set, the evaluation is replaced by that many Bellman
+    sweeps of the current policy starting from the previous values (modified policy
+    iteration), and the iteration stops once the Bellman error drops below epsilon.
+    """
+    def __init__(self, maze: Maze, discount_factor=0.99999, epsilon=0.1, evaluation_sweeps=None):
+        self.maze = maze
+        self.discount_factor = discount_factor
+        self.epsilon = epsilon
+        self.evaluation_sweeps = evaluation_sweeps
+        self.model = maze.get_model()
+        self.performed_iterations = -1
+        start_time = time.perf_counter()
+        values, policy = self.policy_iteration()
+        self.solve_time = time.perf_counter() - start_time
+        self.value_function = self.model.to_grid(values)
+        self.optimal_policy = self.model.policy_grid(policy)
+
+    def get_initial_policy(self):
+        """Heads along the cheapest deterministic path, so the goal is reached from every state that can reach it."""
+        return self.model.shortest_path_policy()
+
+    def evaluate_policy(self, policy, values):
+        P, R = self.model.policy_model(policy)
+        if self.evaluation_sweeps is None:
+            return spsolve((identity(self.model.n_states, format='csc') - self.discount_factor * P).tocsc(), R)
+        for _ in range(self.evaluation_sweeps):
+            values = R + self.discount_factor * P.dot(values)
+        return values
+
+    def policy_iteration(self):
+        policy = self.get_initial_policy()
+        values = np.zeros(self.model.n_states)
+        states = np.arange(self.model.n_states)
+
+        self.performed_iterations = 0
+
+        while True:
+            values = self.evaluate_policy(policy, values)
+            q_values = self.model.q_values(values, self.discount_factor)
+            best_actions = q_values.argmax(axis=0)
+            best_values = q_values[best_actions, states]
+            # keep the current action unless another one is clearly better, ties would cycle
+            improved = best_values > q_values[policy, states] + 1e-9 * np.maximum(1, np.abs(best_values))
+            policy = np.where(improved, best_actions, policy)
+            self.performed_iterations += 1
+
+            delta = np.max(np.abs(best_values - values))
+            logging.debug("Policy iteration %d changed %d actions, delta %f", self.performed_iterations, np.count_nonzero(improved), delta)
+
+            if not improved.any() and (self.evaluation_sweeps is None or delta < self.epsilon):
+                break
+        return values, policy
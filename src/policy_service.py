@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from maze import Maze
+from value_iteration import ValueIteration
+from policy_iteration import PolicyIteration
+from solution_cache import encode_policy, WALL_CODE
+
+algorithms = ["vi", "pi", "ffreplan"]
+ops = ["solve", "action", "actions", "stats"]
+
+
+def solve_policy(maze_path, algorithm="vi"):
+    """Solves the maze and returns its policy as uint8 action codes, the action names and the solve time.
+
+    "ffreplan" is the policy of always heading along the cheapest deterministic path,
+    the moves ffreplan makes with the table planner.
+    """
+    start_time = time.perf_counter()
+    maze = Maze(maze_path)
+    # the progress the solvers print would end up in the output of the service
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if algorithm == "vi":
+            optimal_policy = ValueIteration(maze, mode="vectorized").optimal_policy
+        elif algorithm == "pi":
+            optimal_policy = PolicyIteration(maze).optimal_policy
+        elif algorithm == "ffreplan":
+            model = maze.get_model()
+            optimal_policy = model.policy_grid(model.shortest_path_policy())
+        else:
+            raise ValueError(f"Unknown algorithm: {algorithm}")
+    return encode_policy(optimal_policy, maze.get_actions()), list(maze.get_actions()), time.perf_counter() - start_time
+
+
+def required(request, field):
+    if field not in request:
+        raise ValueError(f"Missing field: {field}")
+    return request[field]
+
+
+def is_position(position):
+    return isinstance(position, list) and len(position) == 2 and \
+        all(isinstance(index, int) and not isinstance(index, bool) for index in position)
+
+
+def parse_positions(positions):
+    """Rows and columns of a list of [row, col] pairs of integers."""
+    if not isinstance(positions, list) or not all(is_position(position) for position in positions):
+        raise ValueError("Positions have to be [row, col] pairs of integers.")
+    return np.array(positions, dtype=np.int64).reshape(-1, 2).T
+
+
+class PolicyService():
+    """Answers "which action from (row, col) in maze M" queries, with the mazes solved once and kept in memory.
+
+    Mazes are named by their path relative to maze_dir, paths outside of it are refused.
+    Solving runs in a pool of worker processes, so lookups are answered while a maze
+    is being solved, and concurrent requests for the same maze share one solve.
+
+    Requests and responses are JSON objects, one per line; an "id" of a request is
+    copied into its response:
+        {"op": "solve", "maze": M}                       -> {"solve_time": seconds}
+        {"op": "action", "maze": M, "pos": [r, c]}       -> {"action": "up"}
+        {"op": "actions", "maze": M, "positions": [...]} -> {"actions": ["up", ...]}
+        {"op": "stats"}                                  -> {"mazes": [...], "solves": n, ...}
+    A maze that is not solved yet is solved by the first query. Errors are answered
+    with {"error": message}.
+    """
+    def __init__(self, maze_dir="dataset", algorithm="vi", workers=1):
+        if algorithm not in algorithms:
+            raise ValueError(f"Unknown algorithm: {algorithm}")
+        self.maze_dir = os.path.realpath(maze_dir)
+        self.algorithm = algorithm
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        # maze name -> (action codes, action names)
+        self.solutions = {}
+        self.solve_times = {}
+        self.pending = {}
+        self.stats = {'solves': 0, 'coalesced': 0, 'queries': 0}
+
+    def maze_path(self, name):
+        path = os.path.realpath(os.path.join(self.maze_dir, name))
+        if os.path.commonpath([path, self.maze_dir]) != self.maze_dir or not os.path.isfile(path):
+            raise ValueError(f"Unknown maze: {name}")
+        return path
+
+    async def solve(self, name):
+        codes, actions, solve_time = await asyncio.get_running_loop().run_in_executor(
+            self.executor, solve_policy, self.maze_path(name), self.algorithm)
+        self.solutions[name] = (codes, np.array(actions + ['#'] * (WALL_CODE + 1 - len(actions)), dtype=object))
+        self.solve_times[name] = solve_time
+        self.stats['solves'] += 1
+        logging.info("Solved %s in %.3f s", name, solve_time)
+
+    async def get_solution(self, name):
+        if name in self.solutions:
+            return self.solutions[name]
+        future = self.pending.get(name)
+        if future is None:
+            future = self.pending[name] = asyncio.ensure_future(self.solve(name))
+            future.add_done_callback(lambda _: self.pending.pop(name, None))
+        else:
+            self.stats['coalesced'] += 1
+        # a cancelled query must not cancel the solve the others are waiting for
+        await asyncio.shield(future)
+        return self.solutions[name]
+
+    async def handle(self, request):
+        if not isinstance(request, dict):
+            raise ValueError("Request has to be a JSON object.")
+        op = request.get('op')
+        # everything is checked before a solve is started for the request
+        if op not in ops:
+            raise ValueError(f"Unknown op: {op}")
+        if op == "stats":
+            return dict(self.stats, mazes=sorted(self.solutions), pending=sorted(self.pending))
+        name = required(request, 'maze')
+        if op == "action":
+            rows, cols = parse_positions([required(request, 'pos')])
+        elif op == "actions":
+            rows, cols = parse_positions(required(request, 'positions'))
+        codes, names = await self.get_solution(name)
+        if op == "solve":
+            return {'solve_time': self.solve_times[name]}
+        self.stats['queries'] += 1
+        actions = self.lookup(codes, names, rows, cols)
+        return {'action': actions[0]} if op == "action" else {'actions': actions}
+
+    def lookup(self, codes, names, rows, cols):
+        rows, cols = np.asarray(rows), np.asarray(cols)
+        if np.any((rows < 0) | (rows >= codes.shape[0]) | (cols < 0) | (cols >= codes.shape[1])):
+            raise ValueError("Position outside of the maze.")
+        return names[codes[rows, cols]].tolist()
+
+    async def serve_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = {}
+                try:
+                    request = json.loads(line)
+                    response = await self.handle(request)
+                except Exception as error:
+                    response = {'error': str(error)}
+                if isinstance(request, dict) and 'id' in request:
+                    response['id'] = request['id']
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            logging.debug("Client disconnected.")
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=0, unix_path=None):
+        """Starts listening on a Unix socket if unix_path is given, otherwise on TCP host:port."""
+        if unix_path is not None:
+            return await asyncio.start_unix_server(self.serve_client, path=unix_path)
+        return await asyncio.start_server(self.serve_client, host, port)
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+class PolicyClient():
+    """Blocking client of a PolicyService, one request at a time."""
+    def __init__(self, host="127.0.0.1", port=None, unix_path=None):
+        if unix_path is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(unix_path)
+        else:
+            self.socket = socket.create_connection((host, port))
+        self.file = self.socket.makefile('rwb')
+
+    def request(self, **request):
+        self.file.write(json.dumps(request).encode() + b'\n')
+        self.file.flush()
+        response = json.loads(self.file.readline())
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response
+
+    def solve(self, maze):
+        return self.request(op="solve", maze=maze)
+
+    def action(self, maze, pos):
+        return self.request(op="action", maze=maze, pos=list(pos))['action']
+
+    def actions(self, maze, positions):
+        return self.request(op="actions", maze=maze, positions=[list(pos) for pos in positions])['actions']
+
+    def stats(self):
+        return self.request(op="stats")
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+
+async def serve(maze_dir, algorithm, workers, host, port, unix_path):
+    service = PolicyService(maze_dir, algorithm, workers)
+    server = await service.start(host, port, unix_path)
+    logging.info("Serving policies of %s on %s", maze_dir, unix_path or server.sockets[0].getsockname())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+if __name__=="__main__":
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Serves policy queries over a local socket.")
+    parser.add_argument("--maze-dir", default="dataset")
+    parser.add_argument("--algorithm", choices=algorithms, default="vi")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="path of a Unix socket to listen on instead of TCP")
+    args = parser.parse_args()
+    asyncio.run(serve(args.maze_dir, args.algorithm, args.workers, args.host, args.port, args.unix))
@@ -0,0 +1,37 @@
+import logging
+
+
+class PolicySolver():
+    """Base of the algorithms that solve the maze up front and then follow optimal_policy.
+
+    Subclasses set maze, optimal_policy (indexed as policy[row][col]) and performed_iterations.
+    With max_steps set, execute() gives up after that many steps of the agent, for
+    policies that are not guaranteed to reach the goal.
+    """
+    max_steps = None
+
+    def get_iterations(self):
+        return self.performed_iterations
+
+    def reset(self):
+        # don't need reseting
+        pass
+
+    def execute(self, agent=None):
+        # use the optimal policy to reach the goal and collect the best rewards
+        agent = agent or self.maze.agent
+        reward = 0
+
+        while True:
+            cur_row, cur_col = agent.get_position()
+            direction = self.optimal_policy[cur_row][cur_col]
+            reward += agent.move(direction)
+
+            if agent.goal_reached():
+                logging.debug("Goal was reached.")
+                break
+            if self.max_steps is not None and agent.steps >= self.max_steps:
+                logging.warning("Goal was not reached in %d steps, stopping.", self.max_steps)
+                break
+
+        return reward
@@ -0,0 +1,130 @@
+import logging
+import random
+import time
+
+import numpy as np
+
+from maze import Maze
+from policy_solver import PolicySolver
+
+
+class QLearning(PolicySolver):
+    """Tabular Q-learning, learns only from the moves of agents in the maze.
+
+    num_envs agents move through the maze in lockstep, each with a random.Random of
+    its own, choosing epsilon-greedy actions from the shared Q-table. After every step
+    the batch of transitions (state, action, reward, next state) is applied to the
+    table at once, an agent reaching the goal starts its next episode right away.
+    q_values is a float32 array of shape (H, W, 4) in the order of maze.get_actions().
+
+    Learning stops after max_episodes episodes or once the greedy policy has settled:
+    every check_interval steps of the batch it is compared with the previous check and
+    counts as stable when at most a fraction tolerance of the free cells changed their
+    action, `patience` stable checks in a row end the learning. With a constant
+    learning rate near ties keep flipping a few cells, so tolerance should not be 0.
+    performed_iterations counts the finished episodes, samples the moves;
+    samples_per_second and converged tell how the learning went.
+
+    The greedy policy of a table that has not converged can loop for a long time or
+    forever, execute() stops an episode after max_steps steps.
+    """
+    def __init__(self, maze: Maze, discount_factor=0.99999, learning_rate=0.1, exploration=0.1, num_envs=64,
+                 max_episodes=20000, check_interval=100, tolerance=0.01, patience=20, seed=0, max_steps=10 ** 5):
+        self.maze = maze
+        self.discount_factor = discount_factor
+        self.learning_rate = learning_rate
+        self.exploration = exploration
+        self.num_envs = num_envs
+        self.max_episodes = max_episodes
+        self.check_interval = check_interval
+        self.tolerance = tolerance
+        self.patience = patience
+        self.max_steps = max_steps
+        self.metrics = maze.metrics
+        self.rng = np.random.default_rng(seed)
+        self.agents = [maze.new_agent(random.Random(seed * num_envs + i)) for i in range(num_envs)]
+        self.performed_iterations = 0
+        self.samples = 0
+        self.converged = False
+        start_time = time.perf_counter()
+
+        self.q_values = np.zeros((maze.num_rows, maze.num_cols, len(maze.get_actions())), dtype=np.float32)
+        self.learn()
+        self.solve_time = time.perf_counter() - start_time
+        self.samples_per_second = self.samples / self.solve_time
+
+        best_actions = self.q_values.argmax(axis=2)
+        self.value_function = np.where(maze.walls, 0, self.q_values.max(axis=2))
+        self.optimal_policy = np.where(maze.walls, '#', np.array(maze.get_actions())[best_actions]).tolist()
+        logging.info("%s learned for %d episodes (%d samples, %.0f samples/s), converged: %s",
+                     type(self).__name__, self.performed_iterations, self.samples, self.samples_per_second,
+                     self.converged)
+        if self.metrics is not None:
+            self.metrics.count('episodes', self.performed_iterations)
+            self.metrics.count('samples', self.samples)
+
+    def choose(self, rows, cols):
+        """Epsilon-greedy actions of the agents at the given positions, the first best action on ties."""
+        actions = self.q_values[rows, cols].argmax(axis=1)
+        explore = self.rng.random(len(actions)) < self.exploration
+        actions[explore] = self.rng.integers(len(self.maze.get_actions()), size=np.count_nonzero(explore))
+        return actions
+
+    def next_values(self, next_rows, next_cols, next_actions):
+        """Values of the next states in the TD targets, the greedy ones."""
+        return self.q_values[next_rows, next_cols].max(axis=1)
+
+    def learn(self):
+        names = self.maze.get_actions()
+        agents = self.agents
+        rows = np.array([agent.cur_row for agent in agents])
+        cols = np.array([agent.cur_col for agent in agents])
+        actions = self.choose(rows, cols)
+        rewards = np.zeros(len(agents), dtype=np.float32)
+        done = np.zeros(len(agents), dtype=bool)
+        next_rows, next_cols = rows.copy(), cols.copy()
+        policy = self.q_values.argmax(axis=2)
+        free = ~self.maze.walls
+        max_changes = max(1, self.tolerance * np.count_nonzero(free))
+        stable_checks = 0
+        steps = 0
+
+        while self.performed_iterations < self.max_episodes:
+            for i, agent in enumerate(agents):
+                rewards[i] = agent.move(names[actions[i]])
+                done[i] = agent.goal_reached()
+                next_rows[i], next_cols[i] = agent.cur_row, agent.cur_col
+                if done[i]:
+                    agent.reset()
+            self.samples += len(agents)
+            self.performed_iterations += int(np.count_nonzero(done))
+
+            # the next actions are chosen from where the agents continue, the start for finished episodes
+            continue_rows = np.where(done, self.maze.start_row, next_rows)
+            continue_cols = np.where(done, self.maze.start_col, next_cols)
+            next_actions = self.choose(continue_rows, continue_cols)
+
+            targets = rewards + np.where(done, 0, self.discount_factor * self.next_values(next_rows, next_cols,
+                                                                                        next_actions))
+            errors = targets - self.q_values[rows, cols, actions]
+            # agents taking the same action in the same state share one update with their mean error
+            index = (rows * self.maze.num_cols + cols) * len(names) + actions
+            index, inverse, counts = np.unique(index, return_inverse=True, return_counts=True)
+            self.q_values.reshape(-1)[index] += self.learning_rate * np.bincount(inverse, errors) / counts
+
+            rows, cols, actions = continue_rows, continue_cols, next_actions
+            steps += 1
+            if steps % self.check_interval == 0:
+                new_policy = self.q_values.argmax(axis=2)
+                changes = np.count_nonzero((new_policy != policy) & free)
+                stable_checks = stable_checks + 1 if changes <= max_changes else 0
+                policy = new_policy
+                if stable_checks >= self.patience:
+                    self.converged = True
+                    break
+
+
+class SARSA(QLearning):
+    """On-policy variant of QLearning, the TD targets use the epsilon-greedy actions the agents take next."""
+    def next_values(self, next_rows, next_cols, next_actions):
+        return self.q_values[next_rows, next_cols, next_actions]
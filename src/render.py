@@ -0,0 +1,122 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+from PIL import Image
+
+from maze import Maze, FREE
+from ffreplan import ffreplan
+from value_iteration import ValueIteration
+
+# the Tk colors used by Maze.draw_maze and friends
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+RED = (255, 0, 0)
+PATH_COLOR = (238, 197, 145)  # burlywood2
+CELL_COLORS = np.array([WHITE, BLACK, (0, 255, 0), RED, (255, 165, 0)], dtype=np.uint8)
+
+
+def arrow_sprites(cell_size):
+    """Boolean masks of an arrow across one cell for every direction, like Maze.draw_arrow_in_pos."""
+    right = np.zeros((cell_size, cell_size), dtype=bool)
+    center = cell_size // 2
+    right[center, :] = True
+    # arrowhead in the shape of the Tk default: 8 px long, 3 px wide to each side
+    for distance in range(min(8, cell_size)):
+        half_width = round(3 * distance / 8)
+        right[max(center - half_width, 0):center + half_width + 1, cell_size - 1 - distance] = True
+    return {'right': right, 'up': np.rot90(right, 1), 'left': np.rot90(right, 2), 'down': np.rot90(right, 3)}
+
+
+def cell_view(image, cell_size):
+    """View of the image indexed as [row, col, y, x, channel]."""
+    height, width, _ = image.shape
+    return image.reshape(height // cell_size, cell_size, width // cell_size, cell_size, 3).swapaxes(1, 2)
+
+
+def stamp(image, cell_size, cells, mask, color):
+    """Paints the mask into all given (row, col) cells at once."""
+    if not len(cells):
+        return
+    rows, cols = np.asarray(cells).T
+    view = cell_view(image, cell_size)
+    view[rows, cols] = np.where(mask[None, :, :, None], np.array(color, dtype=np.uint8), view[rows, cols])
+
+
+def render(maze: Maze, path=None, optimal_policy=None, moves=None, cell_size=20):
+    """Draws the maze into an RGB array, optionally with a path, a policy and recorded moves."""
+    image = np.repeat(np.repeat(CELL_COLORS[maze.grid], cell_size, axis=0), cell_size, axis=1)
+
+    # black outline of the drawn rectangles
+    outline = np.zeros((cell_size, cell_size), dtype=bool)
+    outline[[0, -1], :] = outline[:, [0, -1]] = True
+    stamp(image, cell_size, np.argwhere(maze.grid != FREE), outline, BLACK)
+
+    if path:
+        inset = np.zeros((cell_size, cell_size), dtype=bool)
+        inset[3:cell_size - 3, 3:cell_size - 3] = True
+        inset_outline = inset.copy()
+        inset_outline[4:cell_size - 4, 4:cell_size - 4] = False
+        stamp(image, cell_size, list(path), inset, PATH_COLOR)
+        stamp(image, cell_size, list(path), inset_outline, BLACK)
+
+    sprites = arrow_sprites(cell_size)
+    if optimal_policy is not None:
+        policy = np.array(optimal_policy, dtype=object)
+        for direction, sprite in sprites.items():
+            stamp(image, cell_size, np.argwhere(policy == direction), sprite, BLACK)
+
+    if moves:
+        for successful, color in [(True, BLACK), (False, RED)]:
+            for direction, sprite in sprites.items():
+                cells = [pos for pos, move_direction, move_successful in moves
+                         if move_direction == direction and move_successful == successful]
+                stamp(image, cell_size, cells, sprite, color)
+
+    return image
+
+
+def save_png(image, fname):
+    Image.fromarray(image).save(fname + '.png', 'png')
+
+
+def render_maze_file(maze_path, out_folder, kind, cache=None, mode="async"):
+    """Renders one maze file the way main.py does, kind is "maze", "compare" or "ffreplan".
+    The value iteration of "compare" runs with the given mode and SolutionCache."""
+    maze_name = os.path.splitext(os.path.basename(maze_path))[0]
+    maze = Maze(maze_path)
+    if kind == "maze":
+        image = render(maze)
+        suffix = "_maze_vis"
+    elif kind == "compare":
+        alg = ValueIteration(maze, discount_factor=1, mode=mode, cache=cache)
+        image = render(maze, path=ffreplan(maze).path, optimal_policy=alg.optimal_policy)
+        suffix = "_compare"
+    elif kind == "ffreplan":
+        path = ffreplan(maze).path
+        maze.trajectory = []
+        ffreplan(maze).execute()
+        image = render(maze, path=path, moves=maze.trajectory)
+        suffix = "_ffreplan"
+    else:
+        raise ValueError(f"Unknown rendering: {kind}")
+    fname = os.path.join(out_folder, maze_name + suffix)
+    save_png(image, fname)
+    return fname + '.png'
+
+
+def render_dataset(dataset_path, out_folder, kind, workers=1, cache=None, mode="async"):
+    """Renders every maze of the dataset without a display, in parallel with workers > 1.
+    cache and mode are passed to the value iteration, see render_maze_file."""
+    if not os.path.exists(out_folder):
+        os.mkdir(out_folder)
+
+    mazes = [os.path.join(dataset_path, maze) for maze in os.listdir(dataset_path) if "maze" in maze]
+    logging.info("Rendering %d mazes (%s) into %s", len(mazes), kind, out_folder)
+    render_file = partial(render_maze_file, out_folder=out_folder, kind=kind, cache=cache, mode=mode)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(render_file, mazes))
+    return [render_file(maze) for maze in mazes]
@@ -0,0 +1,72 @@
+import csv
+import json
+import os
+
+# fields of the per-maze records, in the column order of the .csv log
+FIELDS = ['Maze file', 'Maze hash', 'Algorithm', 'Parameters', 'Total Reward', 'Reward std',
+          'Episode length', 'Iterations', 'Rollouts', 'Solve time', 'Rollout time',
+          'CI low', 'CI high', 'Samples', 'Samples per second', 'Converged', 'Replans per episode']
+# how the numeric fields are read back, the other fields stay strings
+CONVERTERS = dict({field: float for field in FIELDS[4:]}, Iterations=int, Rollouts=int, Samples=int,
+                  Converged=lambda value: value == 'True')
+
+
+class ResultsLog():
+    """Append-only log of validation results, written record by record as they finish.
+
+    The format follows the file extension: .jsonl keeps one JSON object per line and
+    can also hold the rewards of finished rollout batches, .csv keeps one row per
+    maze with the FIELDS columns. A .csv log started with fewer columns keeps its
+    header, its rows lack the newer fields. Records are flushed right away, so a
+    crashed sweep loses at most the maze that was running.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.jsonl = not path.endswith('.csv')
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, newline='') as file:
+            if self.jsonl:
+                return [json.loads(line) for line in file if line.strip()]
+            records = list(csv.DictReader(file))
+        for record in records:
+            for field, convert in CONVERTERS.items():
+                # fields the algorithm doesn't report are written empty
+                if record.get(field) in (None, ''):
+                    record.pop(field, None)
+                else:
+                    record[field] = convert(record[field])
+        return records
+
+    def header(self):
+        """Columns of an existing .csv log, None before its first record."""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, newline='') as file:
+            return next(csv.reader(file), None)
+
+    def find(self, kind="maze", **fields):
+        """Records of the given kind whose fields match all the given values."""
+        return [record for record in self.read()
+                if record.get('Kind', "maze") == kind and all(record.get(k) == v for k, v in fields.items())]
+
+    def append(self, record, kind="maze"):
+        if self.jsonl:
+            line = json.dumps(dict(record, Kind=kind)) + '\n'
+            # a single write per record, appends of parallel workers don't interleave
+            with open(self.path, 'a') as file:
+                file.write(line)
+        elif kind == "maze":
+            fields = self.header()
+            with open(self.path, 'a', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=fields or FIELDS, extrasaction='ignore')
+                if fields is None:
+                    writer.writeheader()
+                writer.writerow(record)
+        else:
+            raise ValueError("Rollout batches can only be logged into a .jsonl log.")
@@ -0,0 +1,72 @@
+import numpy as np
+
+from maze import Maze
+
+
+def splitmix64(x):
+    """Counter-based hash, used to draw reproducible random numbers for many episodes at once."""
+    with np.errstate(over='ignore'):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def uniform(episode_keys, step):
+    """Uniform numbers in [0, 1) for each episode at the given step."""
+    with np.errstate(over='ignore'):
+        bits = splitmix64(episode_keys + np.uint64(step) * np.uint64(0xD1B54A32D192ED03))
+    return (bits >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def simulate(maze: Maze, policy, num_rollouts, seed=0, first_rollout=0, max_steps=None):
+    """Runs num_rollouts episodes of a fixed policy in lockstep from the start of the maze.
+
+    policy is either a grid of action names (e.g. ValueIteration.optimal_policy) or a
+    vector of action indices per state of the maze model. The random numbers of an
+    episode depend only on seed, its rollout number and the step, so rollouts
+    first_rollout .. first_rollout + num_rollouts - 1 give the same results no matter
+    how they are split between calls.
+
+    Returns the undiscounted return and the number of moves of every episode.
+    Episodes still running after max_steps moves are cut off.
+    """
+    model = maze.get_model()
+    if isinstance(policy, np.ndarray) and policy.ndim == 1:
+        policy = policy.astype(np.int64)
+    else:
+        policy = model.action_indices(policy)
+
+    # outcome k is taken when the uniform draw falls below its cumulative probability
+    thresholds = np.cumsum(model.outcome_probs, axis=1)
+
+    # flat lookup tables indexed by (action * 3 + outcome) * n_states + state
+    next_states = model.next_states.ravel()
+    outcome_rewards = model.outcome_rewards.ravel()
+    terminal = model.terminal.ravel()
+    policy_offsets = policy * 3 * model.n_states + np.arange(model.n_states)
+
+    rollouts = np.arange(first_rollout, first_rollout + num_rollouts, dtype=np.uint64)
+    keys = splitmix64(splitmix64(np.uint64(seed)) ^ rollouts)
+
+    returns = np.zeros(num_rollouts)
+    lengths = np.zeros(num_rollouts, dtype=np.int64)
+
+    active = np.arange(num_rollouts)
+    positions = np.full(num_rollouts, model.start_state, dtype=np.int64)
+    step = 0
+    while len(active) and (max_steps is None or step < max_steps):
+        draws = uniform(keys[active], step)
+        # the slip probabilities are the same for every action
+        outcomes = np.searchsorted(thresholds[0], draws, side='right')
+        index = policy_offsets[positions] + outcomes * model.n_states
+
+        returns[active] += outcome_rewards[index]
+        lengths[active] += 1
+
+        running = ~terminal[index]
+        positions = next_states[index][running]
+        active = active[running]
+        step += 1
+
+    return returns, lengths
@@ -0,0 +1,116 @@
+import hashlib
+import logging
+import os
+import numpy as np
+
+WALL_CODE = 255
+
+
+def maze_hash(maze_path):
+    """Hash of the maze file contents, identifies a maze independently of its file name."""
+    with open(maze_path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()[:16]
+
+
+def encode_policy(optimal_policy, actions):
+    """Grid of action names -> uint8 action codes, walls get WALL_CODE."""
+    lookup = {action: code for code, action in enumerate(actions)}
+    return np.array([[lookup.get(action, WALL_CODE) for action in row] for row in optimal_policy], dtype=np.uint8)
+
+
+def decode_policy(codes, actions):
+    names = np.array(list(actions) + ['#'] * (WALL_CODE + 1 - len(actions)), dtype=object)
+    return names[codes].tolist()
+
+
+class SolutionCache():
+    """On-disk cache of solved value functions and policies.
+
+    Entries are keyed by the hash of the maze file plus discount factor, epsilon and
+    value iteration mode and stored as .npy files, together with the iterations the
+    solve took. Loaded entries are memory-mapped. When the cache grows
+    over max_bytes, the least recently used entries are deleted.
+    """
+    def __init__(self, cache_dir="cache", max_bytes=256 * 2 ** 20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def entry_name(self, maze, discount_factor, epsilon=None, mode=None):
+        # float() so that a discount factor of 1 and 1.0 share their entries
+        prefix = f"{maze_hash(maze.maze_name)}_{float(discount_factor)!r}_"
+        return prefix if epsilon is None else f"{prefix}{float(epsilon)!r}_{mode}"
+
+    def paths(self, name):
+        return (os.path.join(self.cache_dir, name + ".values.npy"),
+                os.path.join(self.cache_dir, name + ".policy.npy"),
+                os.path.join(self.cache_dir, name + ".iterations.npy"))
+
+    def load(self, maze, discount_factor, epsilon, mode):
+        """Returns the cached value function, policy grid and performed iterations, or None."""
+        paths = self.paths(self.entry_name(maze, discount_factor, epsilon, mode))
+        if not all(os.path.exists(path) for path in paths):
+            return None
+        values_path, policy_path, iterations_path = paths
+        try:
+            values = np.load(values_path, mmap_mode='r')
+            codes = np.load(policy_path, mmap_mode='r')
+            iterations = int(np.load(iterations_path))
+        except (OSError, ValueError):
+            logging.warning("Broken cache entry %s, ignoring it.", values_path)
+            return None
+        # mark as recently used
+        for path in paths:
+            os.utime(path)
+        logging.info("Loaded cached solution %s", values_path)
+        return values, decode_policy(codes, maze.get_actions()), iterations
+
+    def load_warm_start(self, maze, discount_factor, epsilon):
+        """Value function of the same maze and discount factor solved with the closest other epsilon, or None.
+        The values of any mode will do, they all converge to the same ones."""
+        prefix = self.entry_name(maze, discount_factor)
+        candidates = []
+        for fname in os.listdir(self.cache_dir):
+            if fname.startswith(prefix) and fname.endswith(".values.npy"):
+                cached_epsilon = float(fname[len(prefix):-len(".values.npy")].rsplit('_', 1)[0])
+                candidates.append((abs(cached_epsilon - epsilon), fname))
+        if not candidates:
+            return None
+        _, fname = min(candidates)
+        logging.info("Warm starting from cached solution %s", fname)
+        return np.load(os.path.join(self.cache_dir, fname))
+
+    def store(self, maze, discount_factor, epsilon, mode, value_function, optimal_policy, iterations):
+        values_path, policy_path, iterations_path = self.paths(self.entry_name(maze, discount_factor, epsilon, mode))
+        # the iterations go last, an entry only counts as stored once they are there
+        for path, array in [(values_path, np.asarray(value_function)),
+                            (policy_path, encode_policy(optimal_policy, maze.get_actions())),
+                            (iterations_path, np.array(iterations))]:
+            # write next to the target and rename, so parallel workers never see half a file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as file:
+                np.save(file, array)
+            os.replace(tmp_path, path)
+        self.evict(keep=(values_path, policy_path, iterations_path))
+
+    def evict(self, keep=()):
+        # the files of an entry are used and evicted together
+        entries = {}
+        for fname in os.listdir(self.cache_dir):
+            if fname.endswith(".npy"):
+                path = os.path.join(self.cache_dir, fname)
+                stat = os.stat(path)
+                name = fname.rsplit('.', 2)[0]
+                last_used, size, paths = entries.get(name, (0, 0, []))
+                entries[name] = (max(last_used, stat.st_mtime), size + stat.st_size, paths + [path])
+        total = sum(size for _, size, _ in entries.values())
+        for _, size, paths in sorted(entries.values()):
+            if total <= self.max_bytes:
+                break
+            if any(path in keep for path in paths):
+                continue
+            for path in paths:
+                os.remove(path)
+            total -= size
+            logging.info("Evicted cached solution %s", paths[0])
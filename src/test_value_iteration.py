@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from maze import Maze
+from value_iteration import ValueIteration
+from policy_evaluation import evaluate_policy, stationary_policy
+
+DATASET = os.path.join(os.path.dirname(__file__), "dataset")
+
+
+def load(name):
+    return Maze(os.path.join(DATASET, name))
+
+
+def policy_reward(maze, algorithm):
+    reward, _ = evaluate_policy(maze, stationary_policy(maze, algorithm))
+    return reward
+
+
+def test_bfs_order_starts_next_to_the_goal():
+    maze = load("maze-25-A2.txt")
+    vi = ValueIteration(maze, mode="bfs")
+    order = vi.get_goal_order(vi.get_predecessors())
+    assert sorted(order) == list(range(vi.model.n_states))
+    assert order != sorted(order)
+    assert vi.model.terminal[:, :, order[0]].any()
+
+
+def test_bfs_needs_fewer_sweeps_than_async():
+    bfs = ValueIteration(load("maze-25-A2.txt"), mode="bfs")
+    plain = ValueIteration(load("maze-25-A2.txt"), mode="async")
+    assert bfs.get_iterations() < plain.get_iterations()
+
+
+@pytest.mark.parametrize("maze_name", ["maze-15-A1.txt", "maze-25-A2.txt", "maze-25-B.txt"])
+@pytest.mark.parametrize("mode", ["prioritized", "bfs"])
+def test_modes_match_vectorized_policy(maze_name, mode):
+    maze = load(maze_name)
+    expected = policy_reward(maze, ValueIteration(maze, mode="vectorized"))
+    assert policy_reward(maze, ValueIteration(maze, mode=mode)) == pytest.approx(expected, abs=1e-3)